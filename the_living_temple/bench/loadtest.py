@@ -0,0 +1,521 @@
+"""Headless load test: bot pairs play through the rooms over `/ws`.
+
+Run from repo root against a local server:
+
+    python -m bench.loadtest --rooms 200 --duration 60
+    python -m bench.loadtest --spawn --rooms 500 --json out.json   # starts uvicorn itself
+    python -m bench.loadtest --spawn --rooms 500 --compare out.json
+
+Each room gets two bots that join a shared code, ready up and send `input`
+at the client's input rate, walking a script per puzzle kind built from
+shared/rooms.json (stand on plates, read the mural, set the levers, push
+the block, turn the valves, work the final panel, then head for the exit).
+The final code is guessed from the fragments, so runs end in room 4.
+
+Reported over the measured window (after every pair has joined):
+- server tick lag and tick time percentiles, from the worker's `/metrics`
+- state inter-arrival and input-to-state latency (own `seq` echoed back)
+- server CPU from /proc (`--spawn` or `--server-pid`; Linux only)
+- bytes per room per second, both directions
+
+Keep the bots and the server on separate cores: one bot process tops out
+well before the server does, so raise `--rooms` until the server's CPU, not
+the bots', is the limit. Against `server.cluster` the router has no
+`/metrics`; pass a worker's port with `--metrics-url` to see its ticks.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from websockets.asyncio.client import connect
+
+from server.codec import dumps, loads
+
+
+ROOT = Path(__file__).resolve().parent.parent
+SHARED_DIR = ROOT / "shared"
+
+# Same redundancy as the browser client.
+INPUT_REDUNDANCY = 3
+# Bots walk to within this of a target's centre; interact radii overlap neighbouring
+# levers/valves, so pressing from further out can hit the wrong one.
+STAND_RADIUS = 8.0
+# Inputs per interact pulse: one pressed, then released long enough for the state to come back.
+PULSE_INPUTS = 4
+# Guardian stands this far behind the block before grabbing it.
+PUSH_OFFSET = 40.0
+# Input seqs kept for latency samples.
+SENT_TRACK = 256
+
+
+class Step(NamedTuple):
+    at: str
+    # Interact pulses to send once there; 0 means stand there.
+    presses: int = 0
+    # Grab `at` and push it onto this entity.
+    push_to: str | None = None
+    # Keep pulsing until entity `at` shows this (field, value) instead of counting presses.
+    until: tuple[str, Any] | None = None
+
+
+def _scripts(rooms: list[dict[str, Any]]) -> list[dict[str, list[Step]]]:
+    """Steps per room index and role, read from each room's puzzle parameters."""
+    scripts = []
+    for raw in rooms:
+        pz = raw.get("puzzle", {})
+        kind = raw["kind"]
+        if kind == "plates_hold":
+            guardian, scholar = [Step(pz["plates"][0])], [Step(pz["plates"][1])]
+        elif kind == "levers":
+            guardian = [Step(lever, 1, until=("state", n)) for lever, n in zip(pz["levers"], pz["target"])]
+            scholar = [Step(pz["mural"], 1)]
+        elif kind == "block_plate":
+            guardian = [Step(pz["block"], push_to=pz["plate"])]
+            scholar = [Step(pz["switch"], 1)]
+        elif kind == "valves":
+            guardian = [Step(valve, 1) for valve in pz["order"]]
+            scholar = [Step(pz["sign"], 1)]
+        elif kind == "final_panel":
+            guardian = [Step(pz["plates"][0])]
+            scholar = [Step(pz["panel"], 1), Step(pz["plates"][1])]
+        else:
+            guardian, scholar = [], []
+        scripts.append({"guardian": guardian, "scholar": scholar})
+    return scripts
+
+
+def _centre(e: dict[str, Any]) -> tuple[float, float]:
+    return e["x"] + e.get("w", 0) / 2, e["y"] + e.get("h", 0) / 2
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class BotStats:
+    bytes_in: int = 0
+    bytes_out: int = 0
+    states: int = 0
+    intervals: list[float] = field(default_factory=list)
+    latencies: list[float] = field(default_factory=list)
+    max_room: int = 0
+    errors: int = 0
+
+
+class Bot:
+    def __init__(self, url: str, code: str, layout: dict[str, Any], scripts: list, delta: bool) -> None:
+        self.url = url
+        self.code = code
+        self.layout = layout
+        self.scripts = scripts
+        self.delta = delta
+        self.stats = BotStats()
+        self.measuring = False
+        self.player_id = -1
+        self.role = ""
+        self.me: dict[str, Any] = {}
+        self.entities: list[dict[str, Any]] = []
+        self.ui: dict[str, Any] = {}
+        self.room_index = 0
+        self.tick = -1
+        self.msg_ack = 0
+        self.seq = 0
+        self.acked_seq = -1
+        self.sent_at: dict[int, float] = {}
+        self.recent: list[list[Any]] = []
+        self.step = 0
+        self.pulses = 0
+        self.submitted = -1
+        self.last_state_at = 0.0
+
+    # --- wire
+
+    async def _send(self, ws: Any, msg: dict[str, Any]) -> None:
+        text = dumps(msg)
+        if self.measuring:
+            self.stats.bytes_out += len(text)
+        await ws.send(text)
+
+    async def _recv_until(self, ws: Any, msg_type: str) -> dict[str, Any]:
+        while True:
+            msg = loads(await ws.recv())
+            if msg.get("type") in (msg_type, "error"):
+                return msg
+
+    async def run(self, stop: asyncio.Event, input_dt: float) -> None:
+        try:
+            async with connect(self.url, compression=None, max_size=None) as ws:
+                await ws.recv()  # unsolicited welcome
+                await self._send(ws, {"type": "hello", "version": 1, "delta": self.delta})
+                await self._recv_until(ws, "welcome")
+                await self._send(ws, {"type": "join", "room_code": self.code})
+                joined = await self._recv_until(ws, "joined")
+                if joined.get("type") != "joined" or joined.get("player_id", -1) < 0:
+                    self.stats.errors += 1
+                    return
+                self.player_id = joined["player_id"]
+                self.role = joined["role"]
+                await self._send(ws, {"type": "ready", "ready": True})
+                reader = asyncio.create_task(self._read(ws))
+                try:
+                    next_at = time.perf_counter()
+                    while not stop.is_set() and not reader.done():
+                        await self._send_input(ws)
+                        next_at += input_dt
+                        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                finally:
+                    reader.cancel()
+        except Exception:
+            if not stop.is_set():
+                self.stats.errors += 1
+
+    async def _read(self, ws: Any) -> None:
+        async for data in ws:
+            now = time.perf_counter()
+            if self.measuring:
+                self.stats.bytes_in += len(data)
+            msg = loads(data)
+            if msg.get("type") not in ("state", "state_delta"):
+                continue
+            if self.measuring:
+                self.stats.states += 1
+                if self.last_state_at:
+                    self.stats.intervals.append(now - self.last_state_at)
+            self.last_state_at = now
+            self._apply_state(msg, now)
+
+    def _apply_state(self, msg: dict[str, Any], now: float) -> None:
+        if msg.get("room_index", self.room_index) != self.room_index:
+            self.room_index = msg["room_index"]
+            self.stats.max_room = max(self.stats.max_room, self.room_index)
+            self.step = 0
+            self.pulses = 0
+        self.tick = msg.get("tick", self.tick)
+        if msg["type"] == "state":
+            self.entities = [dict(e) for e in msg.get("entities", [])]
+            self.me = {}
+        else:
+            for index, changed in msg.get("entities", []):
+                if index < len(self.entities):
+                    self.entities[index].update(changed)
+        for p in msg.get("players", []):
+            if p.get("player_id") == self.player_id:
+                self.me.update(p)
+        if "ui" in msg:
+            self.ui = msg["ui"]
+        for m in msg.get("messages", []):
+            self.msg_ack = max(self.msg_ack, m.get("id", 0))
+
+        seq = self.me.get("seq", -1)
+        if seq > self.acked_seq:
+            sent = self.sent_at.get(seq)
+            if sent is not None and self.measuring:
+                self.stats.latencies.append(now - sent)
+            for s in [s for s in self.sent_at if s <= seq]:
+                del self.sent_at[s]
+            self.acked_seq = seq
+
+    async def _send_input(self, ws: Any) -> None:
+        move_x, move_y, interact = self._steer()
+        self.seq += 1
+        self.recent = (self.recent + [[self.seq, move_x, move_y, interact]])[-INPUT_REDUNDANCY:]
+        self.sent_at[self.seq] = time.perf_counter()
+        if len(self.sent_at) > SENT_TRACK:
+            del self.sent_at[next(iter(self.sent_at))]
+        msg = {
+            "type": "input",
+            "seq": self.seq,
+            "move_x": move_x,
+            "move_y": move_y,
+            "interact": interact,
+            "ack": self.tick,
+            "msg_ack": self.msg_ack,
+            "inputs": self.recent,
+        }
+        await self._send(ws, msg)
+        if self.ui.get("can_submit") and self.submitted != self.room_index:
+            # Fragments in hint order; a guess, but it exercises the submit path.
+            frags = sorted((f for f in self.ui.get("fragments", []) if f.get("frag")), key=lambda f: f["hint"])
+            await self._send(ws, {"type": "code_submit", "code": "".join(f["frag"] for f in frags)})
+            self.submitted = self.room_index
+
+    # --- script
+
+    def _pos(self, key: str) -> tuple[float, float] | None:
+        index = self.layout["ids"][self.room_index].get(key)
+        if index is None:
+            return None
+        ents = self.entities if index < len(self.entities) else self.layout["rooms"][self.room_index]["entities"]
+        return _centre(ents[index])
+
+    def _steer(self) -> tuple[float, float, bool]:
+        if "x" not in self.me or self.me.get("down"):
+            return 0.0, 0.0, False
+        x, y = self.me["x"], self.me["y"]
+
+        door = next((e for e in self.entities if e.get("type") == "door"), None)
+        if door is not None and door.get("open"):
+            zone = self.layout["exit_zone"]
+            mx, my = self._toward(x, y, zone["x"] + zone["w"] / 2, zone["y"] + zone["h"] / 2, STAND_RADIUS)
+            return mx, my, False
+
+        steps = self.scripts[self.room_index].get(self.role, []) if self.room_index < len(self.scripts) else []
+        if self.step >= len(steps):
+            return 0.0, 0.0, False
+        step = steps[self.step]
+        target = self._pos(step.at)
+        if target is None:
+            self.step += 1
+            return 0.0, 0.0, False
+
+        if step.push_to is not None:
+            goal = self._pos(step.push_to)
+            dx, dy = goal[0] - target[0], goal[1] - target[1]
+            d = math.hypot(dx, dy)
+            if d <= STAND_RADIUS:
+                self.step += 1
+                return 0.0, 0.0, False
+            behind = (target[0] - dx / d * PUSH_OFFSET, target[1] - dy / d * PUSH_OFFSET)
+            if math.hypot(behind[0] - x, behind[1] - y) > PUSH_OFFSET:
+                mx, my = self._toward(x, y, *behind, 2.0)
+                return mx, my, False
+            return dx / d, dy / d, True
+
+        mx, my = self._toward(x, y, *target, STAND_RADIUS)
+        if step.presses == 0 or (mx, my) != (0.0, 0.0):
+            return mx, my, False
+        # Held interact applies every tick, so each pulse is a single pressed input.
+        phase = self.pulses % PULSE_INPUTS
+        if phase == 0:
+            if step.until is not None:
+                index = self.layout["ids"][self.room_index][step.at]
+                field_name, value = step.until
+                done = index < len(self.entities) and self.entities[index].get(field_name) == value
+            else:
+                done = self.pulses >= PULSE_INPUTS * step.presses
+            if done:
+                self.step += 1
+                self.pulses = 0
+                return 0.0, 0.0, False
+        self.pulses += 1
+        return 0.0, 0.0, phase == 0
+
+    @staticmethod
+    def _toward(x: float, y: float, tx: float, ty: float, radius: float) -> tuple[float, float]:
+        dx, dy = tx - x, ty - y
+        d = math.hypot(dx, dy)
+        if d <= radius:
+            return 0.0, 0.0
+        return round(dx / d, 3), round(dy / d, 3)
+
+
+# --- server side
+
+
+def _http_get(url: str) -> str | None:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return resp.read().decode("utf-8")
+    except OSError:
+        return None
+
+
+def _histogram(text: str | None, name: str) -> dict[float, float]:
+    """Cumulative bucket counts of one unlabelled histogram from a Prometheus text dump."""
+    buckets: dict[float, float] = {}
+    prefix = name + '_bucket{le="'
+    for line in (text or "").splitlines():
+        if line.startswith(prefix):
+            le, value = line[len(prefix) :].split('"}', 1)
+            buckets[float(le)] = float(value)
+    return buckets
+
+
+def _histogram_quantile(before: dict[float, float], after: dict[float, float], q: float) -> float | None:
+    # Upper bound of the bucket holding the q-th observation in the window.
+    counts = sorted((le, after[le] - before.get(le, 0.0)) for le in after)
+    if not counts or counts[-1][1] <= 0:
+        return None
+    rank = q * counts[-1][1]
+    for le, cumulative in counts:
+        if cumulative >= rank:
+            return le
+    return None
+
+
+def _cpu_seconds(pid: int) -> float | None:
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    fields = stat.rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _spawn_server(port: int) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "uvicorn", "server.app:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=str(ROOT))
+    for _ in range(100):
+        if _http_get(f"http://127.0.0.1:{port}/health") is not None:
+            return proc
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not come up")
+
+
+def _raise_fd_limit() -> None:
+    # Two sockets per room; the default soft limit of 1024 caps out around 500 rooms.
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _load_layout() -> dict[str, Any]:
+    data = json.loads((SHARED_DIR / "rooms.json").read_text(encoding="utf-8"))
+    ids = [{e["id"]: i for i, e in enumerate(room["entities"]) if "id" in e} for room in data["rooms"]]
+    return {"rooms": data["rooms"], "ids": ids, "exit_zone": data["exit_zone"]}
+
+
+# --- run
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    layout = _load_layout()
+    scripts = _scripts(layout["rooms"])
+    input_dt = json.loads((SHARED_DIR / "movement.json").read_text(encoding="utf-8"))["input_dt"]
+    metrics_url = args.metrics_url or args.url.replace("ws", "http", 1).rsplit("/ws", 1)[0] + "/metrics"
+
+    stop = asyncio.Event()
+    pairs: list[tuple[Bot, Bot]] = []
+    tasks = []
+    for r in range(args.rooms):
+        code = f"{args.prefix}{r:05d}"
+        pair = (Bot(args.url, code, layout, scripts, args.delta), Bot(args.url, code, layout, scripts, args.delta))
+        pairs.append(pair)
+        for bot in pair:
+            tasks.append(asyncio.create_task(bot.run(stop, input_dt)))
+        if args.ramp and (r + 1) % args.ramp == 0:
+            await asyncio.sleep(1.0)
+    # Let the last pairs join and start before measuring.
+    await asyncio.sleep(2.0)
+
+    bots = [bot for pair in pairs for bot in pair]
+    for bot in bots:
+        bot.measuring = True
+    metrics_before = await asyncio.to_thread(_http_get, metrics_url)
+    cpu_before = _cpu_seconds(args.server_pid) if args.server_pid else None
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    window = time.perf_counter() - started
+    cpu_after = _cpu_seconds(args.server_pid) if args.server_pid else None
+    metrics_after = await asyncio.to_thread(_http_get, metrics_url)
+    for bot in bots:
+        bot.measuring = False
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    intervals = [v for bot in bots for v in bot.stats.intervals]
+    latencies = [v for bot in bots for v in bot.stats.latencies]
+    lag = (_histogram(metrics_before, "lt_tick_lag_seconds"), _histogram(metrics_after, "lt_tick_lag_seconds"))
+    step = (_histogram(metrics_before, "lt_tick_seconds"), _histogram(metrics_after, "lt_tick_seconds"))
+    cpu = None
+    if cpu_before is not None and cpu_after is not None:
+        cpu = (cpu_after - cpu_before) / window
+    reached = [max(a.stats.max_room, b.stats.max_room) for a, b in pairs]
+    bytes_in = sum(bot.stats.bytes_in for bot in bots)
+    bytes_out = sum(bot.stats.bytes_out for bot in bots)
+    return {
+        "rooms": args.rooms,
+        "window_s": round(window, 2),
+        "bot_errors": sum(bot.stats.errors for bot in bots),
+        "rooms_reached": {str(i): reached.count(i) for i in sorted(set(reached))},
+        "tick_lag_p50_s": _histogram_quantile(*lag, 0.5),
+        "tick_lag_p99_s": _histogram_quantile(*lag, 0.99),
+        "tick_time_p99_s": _histogram_quantile(*step, 0.99),
+        "state_interval_p50_s": _percentile(intervals, 0.5),
+        "state_interval_p99_s": _percentile(intervals, 0.99),
+        "input_latency_p50_s": _percentile(latencies, 0.5),
+        "input_latency_p99_s": _percentile(latencies, 0.99),
+        "states_per_bot_per_s": sum(bot.stats.states for bot in bots) / len(bots) / window if bots else 0.0,
+        "server_cpu_cores": cpu,
+        "rooms_per_core": args.rooms / cpu if cpu else None,
+        "bytes_in_per_room_s": bytes_in / args.rooms / window if args.rooms else 0.0,
+        "bytes_out_per_room_s": bytes_out / args.rooms / window if args.rooms else 0.0,
+    }
+
+
+def _print_report(report: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    for key, value in report.items():
+        line = f"{key:24} {_fmt(value)}"
+        if baseline is not None and isinstance(value, (int, float)) and isinstance(baseline.get(key), (int, float)):
+            old = baseline[key]
+            if old:
+                line += f"   (baseline {_fmt(old)}, {100.0 * (value - old) / old:+.1f}%)"
+        print(line)
+
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Drive bot pairs against a game server and report its limits.")
+    parser.add_argument("--url", default=None, help="default: ws://127.0.0.1:<port>/ws")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rooms", type=int, default=50, help="bot pairs, one room each")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds after the ramp")
+    parser.add_argument("--ramp", type=int, default=50, help="rooms opened per second (0: all at once)")
+    parser.add_argument("--delta", action="store_true", help="bots ask for state_delta frames")
+    parser.add_argument("--prefix", default="B", help="room code prefix; vary it to run several harnesses")
+    parser.add_argument("--spawn", action="store_true", help="start `uvicorn server.app:app` on --port")
+    parser.add_argument("--server-pid", type=int, default=None, help="sample this process's CPU from /proc")
+    parser.add_argument("--metrics-url", default=None, help="default: /metrics next to --url")
+    parser.add_argument("--json", default=None, help="write the report here")
+    parser.add_argument("--compare", default=None, help="report JSON from an earlier run to diff against")
+    args = parser.parse_args(argv)
+    args.url = args.url or f"ws://127.0.0.1:{args.port}/ws"
+
+    _raise_fd_limit()
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    proc = _spawn_server(args.port) if args.spawn else None
+    if proc is not None and args.server_pid is None:
+        args.server_pid = proc.pid
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=5)
+
+    _print_report(report, baseline)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
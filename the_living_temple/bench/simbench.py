@@ -0,0 +1,244 @@
+"""Simulation microbenchmarks: rooms stepped in-process, no sockets.
+
+Run from repo root:
+
+    python -m bench.simbench                      # all rooms, all cases
+    python -m bench.simbench --rooms 2 3 --ticks 5000
+    python -m bench.simbench --json base.json     # save a baseline
+    python -m bench.simbench --compare base.json  # diff against it, exit 1 past --tolerance
+
+Each case builds a GameServer Room with two players on unstarted outboxes
+and drives it with seeded synthetic inputs (random walks between entities,
+interact held about a third of the time), so runs are repeatable:
+- `room_tick`: rooms.room_tick, the puzzle and hazard logic alone
+- `simulate`: GameServer._simulate, movement + room_tick + interactions
+- `step`: GameServer._step_room, inputs queued per connection and drained
+- `broadcast_keyframe` / `broadcast_delta` / `broadcast_binary`: one
+  _broadcast_state per tick, building and encoding what the sockets would get
+
+Only the named call is timed; generating inputs (and, for the broadcast cases,
+stepping the room) happens between timed calls. Per case: mean and p99 wall
+time per tick, plus a separate tracemalloc pass (tracing slows everything
+down, so it is never timed) for the peak memory above the starting point and
+the bytes still held per tick afterwards.
+Rooms never advance during a case; the door may open but exits are ignored.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from server import game_server as gs
+from server.rooms import ROOM_COUNT, room_tick
+from server.util import normalize
+
+
+# Ticks per case before measuring, so caches and the snapshot history fill.
+WARMUP_TICKS = 200
+# Interact held on roughly this share of inputs.
+INTERACT_RATE = 0.35
+# Inputs between picking a new entity to walk to.
+RETARGET_EVERY = 40
+
+
+class _BenchServer(gs.GameServer):
+    def _advance_room(self, room: gs.Room) -> None:
+        # Keep the room under test.
+        pass
+
+
+class _NullSocket:
+    # Outboxes are never started, so nothing is ever sent.
+    pass
+
+
+def _make_room(server: _BenchServer, room_index: int, delta: bool, binary: bool) -> gs.Room:
+    room = server._create_room(f"BENCH{room_index}")
+    room.room_index = room_index
+    room.room_static, room.room_runtime = gs.build_room(room_index, room.code_fragments[room_index])
+    for pid, role in ((1, "guardian"), (2, "scholar")):
+        room.conns[pid] = gs.PlayerConn(ws=_NullSocket(), player_id=pid, role=role, delta=delta, binary=binary)
+        x, y = server._spawn_for(room_index, role)
+        room.players[pid] = gs.PlayerState(player_id=pid, role=role, x=x, y=y, ready=True)
+    room.started = True
+    return room
+
+
+class _Inputs:
+    """Seeded random walk between entity centres for both players."""
+
+    def __init__(self, room: gs.Room, seed: int) -> None:
+        self.room = room
+        self.rng = random.Random(seed)
+        self.targets: dict[int, tuple[float, float]] = {}
+        self.seq = 0
+
+    def next(self, pid: int) -> tuple[float, float, bool]:
+        rng = self.rng
+        if self.seq % RETARGET_EVERY == 0 or pid not in self.targets:
+            e = rng.choice(self.room.room_runtime["entities"])
+            self.targets[pid] = (e.x + e.w / 2 + rng.uniform(-10, 10), e.y + e.h / 2 + rng.uniform(-10, 10))
+        ps = self.room.players[pid]
+        tx, ty = self.targets[pid]
+        dx, dy = tx - ps.x, ty - ps.y
+        if dx * dx + dy * dy < 100:
+            dx, dy = 0.0, 0.0
+        mx, my = normalize(dx + rng.uniform(-20, 20), dy + rng.uniform(-20, 20))
+        return mx, my, rng.random() < INTERACT_RATE
+
+    def set_held(self) -> None:
+        # Straight onto the connection, as _drain_input would leave it.
+        self.seq += 1
+        for pid, conn in self.room.conns.items():
+            conn.move_x, conn.move_y, conn.interact_held = self.next(pid)
+            conn.moves = [(conn.move_x, conn.move_y)]
+
+    def queue(self) -> None:
+        self.seq += 1
+        for pid, conn in self.room.conns.items():
+            mx, my, interact = self.next(pid)
+            conn.inputs.append((self.seq, mx, my, interact))
+
+
+def _case(name: str, room_index: int, seed: int) -> tuple[Callable[[], None], Callable[[], None]]:
+    """Set up one case; returns (prepare, tick): prepare runs untimed before each timed tick."""
+    delta = name in ("broadcast_delta", "broadcast_binary")
+    server = _BenchServer()
+    room = _make_room(server, room_index, delta=delta, binary=name == "broadcast_binary")
+    inputs = _Inputs(room, seed)
+    dt = 1.0 / server.sim_hz
+
+    def advance_clock() -> None:
+        inputs.set_held()
+        room.tick += 1
+        room.time = room.tick / server.sim_hz
+
+    if name == "room_tick":
+        return advance_clock, lambda: room_tick(room, dt)
+    if name == "simulate":
+        return advance_clock, lambda: server._simulate(room, dt)
+    if name == "step":
+        return inputs.queue, lambda: server._step_room(room)
+
+    def step_and_ack() -> None:
+        inputs.queue()
+        server._step_room(room)
+        for conn in room.conns.values():
+            conn.next_send_tick = 0
+            # Ack the previous state so delta connections diff against it, as a healthy client would.
+            conn.ack_tick = room.tick - 1
+
+    def broadcast() -> None:
+        coro = server._broadcast_state(room)
+        try:
+            coro.send(None)
+        except StopIteration:
+            return
+        coro.close()
+        raise RuntimeError("_broadcast_state suspended; this benchmark drives it without a loop")
+
+    return step_and_ack, broadcast
+
+
+CASES = ("room_tick", "simulate", "step", "broadcast_keyframe", "broadcast_delta", "broadcast_binary")
+
+
+def _time_case(name: str, room_index: int, ticks: int, seed: int) -> dict[str, float]:
+    prepare, tick = _case(name, room_index, seed)
+    for _ in range(WARMUP_TICKS):
+        prepare()
+        tick()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(ticks):
+        prepare()
+        start = clock()
+        tick()
+        samples.append(clock() - start)
+    samples.sort()
+    return {
+        "mean_us": sum(samples) / len(samples) / 1000.0,
+        "p99_us": samples[min(len(samples) - 1, int(0.99 * len(samples)))] / 1000.0,
+    }
+
+
+def _memory_case(name: str, room_index: int, ticks: int, seed: int) -> dict[str, float]:
+    # Counts prepare's allocations too; they are small next to the cases' own.
+    prepare, tick = _case(name, room_index, seed)
+    for _ in range(WARMUP_TICKS):
+        prepare()
+        tick()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(ticks):
+            prepare()
+            tick()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib": (peak - before) / 1024.0, "retained_b_per_tick": (after - before) / ticks}
+
+
+def run(rooms: list[int], cases: list[str], ticks: int, seed: int) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    for room_index in rooms:
+        for name in cases:
+            key = f"room{room_index}/{name}"
+            results[key] = {**_time_case(name, room_index, ticks, seed), **_memory_case(name, room_index, ticks, seed)}
+            r = results[key]
+            print(
+                f"{key:28} {r['mean_us']:9.1f} us/tick  p99 {r['p99_us']:9.1f} us"
+                f"  peak {r['peak_kib']:8.1f} KiB  retained {r['retained_b_per_tick']:8.1f} B/tick",
+                flush=True,
+            )
+    return results
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float) -> bool:
+    """Print mean time changes against a baseline; False if any case got slower than `tolerance`."""
+    ok = True
+    for key, r in results.items():
+        old = baseline.get(key)
+        if not old or not old.get("mean_us"):
+            continue
+        change = (r["mean_us"] - old["mean_us"]) / old["mean_us"]
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{key:28} {old['mean_us']:9.1f} -> {r['mean_us']:9.1f} us/tick  {100.0 * change:+6.1f}%{flag}")
+    return ok
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Step rooms in-process and report per-tick cost.")
+    parser.add_argument("--rooms", type=int, nargs="*", default=list(range(ROOM_COUNT)))
+    parser.add_argument("--cases", nargs="*", choices=CASES, default=list(CASES))
+    parser.add_argument("--ticks", type=int, default=2000, help="measured ticks per case")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", default=None, help="write results here (a baseline for --compare)")
+    parser.add_argument("--compare", default=None, help="results JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.rooms, args.cases, args.ticks, args.seed)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    if args.compare:
+        baseline: dict[str, Any] = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print()
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
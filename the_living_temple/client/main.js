@@ -27,10 +27,72 @@ let playerId = null;
 let role = null;
 let ready = false;
 
+// Resume: `joined` hands out a token; if the socket drops, reconnect with it (backing off) while the
+// server still holds our seat (`resume_s`), and pick up from a fresh keyframe.
+const RECONNECT_MIN_MS = 250;
+const RECONNECT_MAX_MS = 4000;
+// Close code for a seat taken over by another connection (resumed elsewhere); don't fight it.
+const CLOSE_RESUMED_ELSEWHERE = 4009;
+// Close code for an idle lobby put to sleep on the server; the token stays good, so resume on the next input.
+const CLOSE_HIBERNATED = 4010;
+let resumeToken = null;
+let asleep = false;
+let resumeMs = 0;
+let resumeDeadline = 0;
+let reconnectDelayMs = RECONNECT_MIN_MS;
+let reconnectTimer = null;
+
+// Version 2 enables binary input/state frames; the layout is "x-binary" in shared/schema.json.
+const PROTOCOL_VERSION = 2;
+let binaryFrames = false;
+
 let inputSeq = 0;
+// Each input frame repeats the last few inputs so a lost frame doesn't stall movement.
+const INPUT_REDUNDANCY = 3;
+let recentInputs = [];
+
+// Local prediction: the server's movement rules (shared/movement.json) applied to our own
+// inputs right away, rebased on every state from the last input the server applied.
+const PREDICTION_MAX_PENDING = 60;
+const PREDICTION_SNAP_PX = 48;
+let movement = null;
+let pendingInputs = [];
+let predicted = null;
+let shownPos = null;
+let shownAt = 0;
+// Interpolation: states are drawn `renderDelayMs` in the past on the server's tick clock, blended
+// between the two buffered states around that time (extrapolated briefly if the next is late).
+const INTERP_BUFFER = 32;
+const INTERP_MIN_DELAY_MS = 50;
+const INTERP_MAX_DELAY_MS = 300;
+const INTERP_MAX_EXTRAPOLATE_MS = 100;
+const INTERP_KEYS = ["x", "y", "w", "h"];
+let tickMs = 50;
+let interpBuffer = [];
+let clockOffsetMs = null;
+let jitterMs = 0;
+let stateIntervalMs = 50;
+let renderDelayMs = 100;
+
+fetch("/shared/movement.json")
+  .then((r) => (r.ok ? r.json() : null))
+  .then((m) => {
+    movement = m;
+  })
+  .catch(() => {});
 let lastState = null;
 let prevState = null;
 
+// Reconstructed snapshots by tick; deltas from the server are applied on top of the acked one.
+const SNAPSHOT_KEEP = 64;
+const snapshots = new Map();
+let ackTick = -1;
+
+// Messages arrive once (until acked) with a per-room id; the log keeps the recent ones for the HUD.
+const MESSAGE_LOG_SIZE = 25;
+let messageLog = [];
+let msgAck = 0;
+
 const keys = new Set();
 let interactHeld = false;
 
@@ -65,10 +127,15 @@ const ROLE_META = {
   scholar: { name: "Scholar", color: "#2ea043", desc: "Agile: reads clues, activates switches." },
 };
 
-// Render caches (procedural "pixel-dungeon" look)
+// Render caches (procedural "pixel-dungeon" look). What never moves is drawn once per room into a
+// bitmap (floor, walls, trim, decals), as are the vignette and the torch glow; a frame blits those
+// and only draws torch flicker, entities, players and overlays itself.
 const renderCache = {
-  patterns: new Map(), // key: `${roomIndex}` -> { floorPattern, wallPattern }
+  rooms: new Map(), // room_index -> static layer (see makeLayer)
+  vignette: null,
+  torchGlow: null,
 };
+const TORCH_GLOW_R = 120;
 
 class SoundEngine {
   constructor() {
@@ -79,8 +146,6 @@ class SoundEngine {
     this.sfxGain = null;
     this.musicTimer = null;
     this.musicState = { step: 0, lastNoteTime: 0, rootHz: 110 };
-    this._lastMsgT = -1;
-    this._seenMsgKeys = new Set();
   }
 
   async toggle() {
@@ -125,8 +190,6 @@ class SoundEngine {
     this.master = null;
     this.musicGain = null;
     this.sfxGain = null;
-    this._seenMsgKeys.clear();
-    this._lastMsgT = -1;
   }
 
   _now() {
@@ -367,7 +430,7 @@ class SoundEngine {
   }
 
   // ---------- Event hooks ----------
-  handleNewState(state, prev) {
+  handleNewState(state, prev, newMessages) {
     if (!this.enabled) return;
 
     // room change
@@ -402,30 +465,29 @@ class SoundEngine {
     // final unlock
     if (prev && !prev.ui?.final_unlocked && state.ui?.final_unlocked) this.sfxFinalSuccess();
 
-    this._handleMessages(state);
+    this._handleMessages(newMessages);
   }
 
   _handleEntityDeltas(state, prev) {
-    const prevEnt = indexEntities(prev);
-    for (const e of state.entities ?? []) {
-      const id = e.id ?? `${e.type}:${e.x}:${e.y}`;
-      const pe = prevEnt.get(id);
-      if (!pe) continue;
+    // The entity list is index-aligned within a room (ids are list positions), so compare
+    // slot by slot; a room change has its own sound and nothing to compare against.
+    if ((state.room_index ?? 0) !== (prev.room_index ?? 0)) return;
+    const ents = state.entities ?? [];
+    const prevEnts = prev.entities ?? [];
+    if (ents.length !== prevEnts.length) return;
+    for (let i = 0; i < ents.length; i++) {
+      const e = ents[i];
+      const pe = prevEnts[i];
+      if (e === pe || e.type !== pe.type) continue;
       if (e.type === "lever" && (e.state ?? 0) !== (pe.state ?? 0)) this.sfxLever();
       if (e.type === "switch" && !!e.on !== !!pe.on) this.sfxInteract();
       if (e.type === "panel" && !!e.active !== !!pe.active) this.sfxInteract();
     }
   }
 
-  _handleMessages(state) {
-    const msgs = state.messages ?? [];
+  _handleMessages(msgs) {
+    // Only messages not seen before are passed in, so there is no replay burst on enable.
     for (const m of msgs) {
-      const t = m.t ?? -1;
-      const key = `${t}|${m.kind}|${m.player_id ?? ""}|${m.text ?? ""}`;
-      if (this._seenMsgKeys.has(key)) continue;
-      // only react to recent ones, to avoid a burst on enable
-      if (this._lastMsgT >= 0 && t <= this._lastMsgT) continue;
-      this._seenMsgKeys.add(key);
       if (m.kind === "ping") this.sfxPing();
       if (m.kind === "chat") this._click(0.04, 740);
       if (m.kind === "system") {
@@ -439,8 +501,6 @@ class SoundEngine {
         if (txt.includes("Final code accepted")) this.sfxFinalSuccess();
       }
     }
-    const lastT = msgs.length ? Math.max(...msgs.map((m) => m.t ?? -1)) : -1;
-    if (lastT > this._lastMsgT) this._lastMsgT = lastT;
   }
 }
 
@@ -449,15 +509,6 @@ function isDoorOpen(state) {
   return false;
 }
 
-function indexEntities(state) {
-  const map = new Map();
-  for (const e of state.entities ?? []) {
-    const id = e.id ?? `${e.type}:${e.x}:${e.y}`;
-    map.set(id, e);
-  }
-  return map;
-}
-
 const audio = new SoundEngine();
 
 function setStatus(text) {
@@ -479,23 +530,147 @@ function send(msg) {
   ws.send(JSON.stringify(msg));
 }
 
-function connect() {
+function sendInput(msg) {
+  recentInputs.push(msg);
+  if (recentInputs.length > INPUT_REDUNDANCY) recentInputs.shift();
+  if (!binaryFrames) {
+    send({ ...msg, inputs: recentInputs.map((i) => [i.seq, i.move_x, i.move_y, i.interact]) });
+    return;
+  }
+  if (!ws || ws.readyState !== WebSocket.OPEN) return;
+  ws.send(encodeBinaryInput(msg, recentInputs.slice(0, -1)));
+}
+
+// ---------- Binary frames (little-endian, positions in 1/8 px) ----------
+const BIN_FRAME_INPUT = 1;
+const BIN_FRAME_KEYFRAME = 2;
+const BIN_POS_SCALE = 8;
+const BIN_ROLES = ["guardian", "scholar"];
+const BIN_ENTITY_TYPES = ["door", "plate", "spikes", "mural", "lever", "block", "switch", "valve", "water", "panel", "sign"];
+const BIN_ENTITY_FLAGS = ["open", "active", "read", "on", "grabbed"];
+const BIN_INPUT_SIZE = 16;
+const BIN_INPUT_PREV_SIZE = 7;
+const BIN_HEADER_SIZE = 12;
+const BIN_PLAYER_SIZE = 12;
+const BIN_ENTITY_SIZE = 12;
+const textDecoder = new TextDecoder();
+
+function encodeBinaryInput(msg, prev = []) {
+  const buf = new ArrayBuffer(BIN_INPUT_SIZE + prev.length * BIN_INPUT_PREV_SIZE);
+  const v = new DataView(buf);
+  v.setUint8(0, BIN_FRAME_INPUT);
+  v.setUint32(1, msg.seq >>> 0, true);
+  v.setInt8(5, Math.round(msg.move_x * 127));
+  v.setInt8(6, Math.round(msg.move_y * 127));
+  v.setUint8(7, msg.interact ? 1 : 0);
+  v.setInt32(8, msg.ack, true);
+  v.setUint32(12, msg.msg_ack >>> 0, true);
+  let off = BIN_INPUT_SIZE;
+  for (const p of prev) {
+    v.setUint32(off, p.seq >>> 0, true);
+    v.setInt8(off + 4, Math.round(p.move_x * 127));
+    v.setInt8(off + 5, Math.round(p.move_y * 127));
+    v.setUint8(off + 6, p.interact ? 1 : 0);
+    off += BIN_INPUT_PREV_SIZE;
+  }
+  return buf;
+}
+
+function decodeBinaryState(buf) {
+  const v = new DataView(buf);
+  const kind = v.getUint8(0);
+  const tick = v.getUint32(1, true);
+  const baseTick = v.getInt32(5, true);
+  const roomIndex = v.getUint8(9);
+  const nPlayers = v.getUint8(10);
+  const nEntities = v.getUint8(11);
+  let off = BIN_HEADER_SIZE;
+
+  const players = [];
+  for (let i = 0; i < nPlayers; i++, off += BIN_PLAYER_SIZE) {
+    const flags = v.getUint8(off + 1);
+    players.push({
+      player_id: v.getUint8(off),
+      role: BIN_ROLES[flags >> 2] ?? "guardian",
+      down: !!(flags & 1),
+      ready: !!(flags & 2),
+      x: v.getUint16(off + 2, true) / BIN_POS_SCALE,
+      y: v.getUint16(off + 4, true) / BIN_POS_SCALE,
+      hp: v.getUint8(off + 6),
+      revive_progress: v.getUint8(off + 7) / 50,
+      seq: v.getInt32(off + 8, true),
+    });
+  }
+
+  const entities = [];
+  for (let i = 0; i < nEntities; i++, off += BIN_ENTITY_SIZE) {
+    const idx = v.getUint8(off);
+    const flags = v.getUint8(off + 2);
+    const e = {
+      id: idx,
+      type: BIN_ENTITY_TYPES[v.getUint8(off + 1)],
+      state: v.getInt8(off + 3),
+      x: v.getInt16(off + 4, true) / BIN_POS_SCALE,
+      y: v.getInt16(off + 6, true) / BIN_POS_SCALE,
+      w: v.getUint16(off + 8, true) / BIN_POS_SCALE,
+      h: v.getUint16(off + 10, true) / BIN_POS_SCALE,
+    };
+    BIN_ENTITY_FLAGS.forEach((name, bit) => {
+      e[name] = !!(flags & (1 << bit));
+    });
+    entities.push([idx, e]);
+  }
+
+  const tailLen = v.getUint16(off, true);
+  const tail = JSON.parse(textDecoder.decode(new Uint8Array(buf, off + 2, tailLen)));
+
+  if (kind === BIN_FRAME_KEYFRAME) {
+    return { type: "state", keyframe: true, tick, room_index: roomIndex, players, entities: entities.map(([, e]) => e), ...tail };
+  }
+  return { type: "state_delta", tick, base_tick: baseTick, room_index: roomIndex, players, entities, ...tail };
+}
+
+function connect(resume = false) {
   if (ws && (ws.readyState === WebSocket.OPEN || ws.readyState === WebSocket.CONNECTING)) return;
+  clearTimeout(reconnectTimer);
+  reconnectTimer = null;
+  asleep = false;
 
   ws = new WebSocket(wsUrl());
-  setStatus("Connecting...");
+  ws.binaryType = "arraybuffer";
+  binaryFrames = false;
+  setStatus(resume ? "Reconnecting..." : "Connecting...");
   joined = false;
-  roomCode = null;
-  playerId = null;
-  role = null;
-  ready = false;
+  if (!resume) {
+    roomCode = null;
+    playerId = null;
+    role = null;
+    ready = false;
+    resumeToken = null;
+    messageLog = [];
+    msgAck = 0;
+  }
+  // Per-socket state: the server starts a resumed connection from a keyframe.
+  snapshots.clear();
+  ackTick = -1;
+  recentInputs = [];
+  pendingInputs = [];
+  predicted = null;
+  shownPos = null;
+  interpBuffer = [];
+  clockOffsetMs = null;
   readyBtn.disabled = true;
   submitCodeBtn.disabled = true;
   setRoomAndRole();
 
-  ws.addEventListener("open", () => {
+  const sock = ws;
+  sock.addEventListener("open", () => {
     setStatus("Connected");
-    send({ type: "hello", version: 1 });
+    send({ type: "hello", version: PROTOCOL_VERSION, delta: true });
+    if (resume && resumeToken) {
+      send({ type: "join", room_code: roomCode, resume_token: resumeToken, player_name: playerNameInput.value.trim() });
+      return;
+    }
     send({
       type: "join",
       room_code: roomCodeInput.value.trim().toUpperCase(),
@@ -503,19 +678,37 @@ function connect() {
     });
   });
 
-  ws.addEventListener("close", () => {
-    setStatus("Disconnected");
+  sock.addEventListener("close", (evt) => {
+    if (sock !== ws) return;
+    const wasJoined = joined;
     joined = false;
     readyBtn.disabled = true;
     submitCodeBtn.disabled = true;
+    if (resumeToken && evt.code === CLOSE_HIBERNATED) {
+      asleep = true;
+      setStatus("Room is asleep, press a key or click to rejoin");
+      return;
+    }
+    if (wasJoined && resumeToken && evt.code !== CLOSE_RESUMED_ELSEWHERE) {
+      resumeDeadline = Date.now() + resumeMs;
+      reconnectDelayMs = RECONNECT_MIN_MS;
+    }
+    if (resumeToken && evt.code !== CLOSE_RESUMED_ELSEWHERE && Date.now() < resumeDeadline) {
+      setStatus("Connection lost, reconnecting...");
+      reconnectTimer = setTimeout(() => connect(true), reconnectDelayMs);
+      reconnectDelayMs = Math.min(reconnectDelayMs * 2, RECONNECT_MAX_MS);
+      return;
+    }
+    resumeToken = null;
+    setStatus("Disconnected");
   });
 
-  ws.addEventListener("error", () => setStatus("Error"));
+  sock.addEventListener("error", () => setStatus("Error"));
 
-  ws.addEventListener("message", (evt) => {
+  sock.addEventListener("message", (evt) => {
     let msg;
     try {
-      msg = JSON.parse(evt.data);
+      msg = evt.data instanceof ArrayBuffer ? decodeBinaryState(evt.data) : JSON.parse(evt.data);
     } catch {
       return;
     }
@@ -524,7 +717,11 @@ function connect() {
 }
 
 function onMessage(msg) {
-  if (msg.type === "welcome") return;
+  if (msg.type === "welcome") {
+    binaryFrames = (msg.version ?? 1) >= PROTOCOL_VERSION;
+    if (msg.tick_hz) tickMs = 1000 / msg.tick_hz;
+    return;
+  }
 
   if (msg.type === "error") {
     setStatus(`Error: ${msg.message}`);
@@ -536,20 +733,199 @@ function onMessage(msg) {
     roomCode = msg.room_code;
     playerId = msg.player_id;
     role = msg.role;
+    resumeToken = msg.resume_token ?? null;
+    resumeMs = (msg.resume_s ?? 0) * 1000;
+    if (!msg.resumed) {
+      // A fresh seat (first join, or the held one expired): the server has us unready.
+      ready = false;
+      readyBtn.textContent = "Ready";
+    }
     setRoomAndRole();
     readyBtn.disabled = false;
     submitCodeBtn.disabled = false;
-    setStatus("Joined");
+    setStatus(msg.resumed ? "Reconnected" : "Joined");
     return;
   }
 
   if (msg.type === "state") {
-    prevState = lastState;
-    lastState = msg;
-    updateHud(msg);
-    audio.handleNewState(msg, prevState);
+    acceptState(msg);
+    return;
+  }
+
+  if (msg.type === "state_delta") {
+    const base = snapshots.get(msg.base_tick);
+    if (!base) {
+      // Baseline is gone; acking -1 makes the server send a keyframe.
+      ackTick = -1;
+      return;
+    }
+    acceptState(applyStateDelta(base, msg));
+    return;
+  }
+}
+
+function acceptState(state) {
+  if (lastState && state.tick <= lastState.tick && !state.keyframe) return;
+  snapshots.set(state.tick, state);
+  for (const t of snapshots.keys()) {
+    if (t <= state.tick - SNAPSHOT_KEEP) snapshots.delete(t);
+  }
+  ackTick = state.tick;
+
+  const fresh = mergeMessages(state.messages ?? [], state.tick);
+  state.messages = messageLog;
+
+  prevState = lastState;
+  lastState = state;
+  bufferState(state);
+  reconcile(state);
+  updateHud(state);
+  audio.handleNewState(state, prevState, fresh);
+}
+
+function bufferState(state) {
+  const serverMs = state.tick * tickMs;
+  const sample = performance.now() - serverMs;
+  const last = interpBuffer[interpBuffer.length - 1];
+  // A state far behind the tick clock means the room sat paused (ticks stop); start the clock over.
+  const paused = clockOffsetMs !== null && sample - clockOffsetMs > INTERP_MAX_DELAY_MS + INTERP_MAX_EXTRAPOLATE_MS;
+  if (clockOffsetMs === null || paused || (last && last.state.room_index !== state.room_index)) {
+    interpBuffer = [];
+    clockOffsetMs = sample;
+  } else {
+    // Early arrivals pull the offset down fast, late ones drift it up slowly; the spread is the jitter.
+    const dev = sample - clockOffsetMs;
+    clockOffsetMs += dev < 0 ? dev * 0.5 : dev * 0.02;
+    jitterMs = jitterMs * 0.9 + Math.abs(dev) * 0.1;
+    if (last) stateIntervalMs = stateIntervalMs * 0.9 + (serverMs - last.time) * 0.1;
+  }
+  renderDelayMs = Math.max(INTERP_MIN_DELAY_MS, Math.min(INTERP_MAX_DELAY_MS, stateIntervalMs + 2 * jitterMs));
+  interpBuffer.push({ time: serverMs, state });
+  if (interpBuffer.length > INTERP_BUFFER) interpBuffer.shift();
+}
+
+function lerpFields(a, b, t) {
+  if (!a) return b;
+  const out = { ...b };
+  for (const k of INTERP_KEYS) {
+    if (typeof a[k] === "number" && typeof b[k] === "number") out[k] = a[k] + (b[k] - a[k]) * t;
+  }
+  return out;
+}
+
+function interpolatedView() {
+  // Players and entities at render time; everything else comes from lastState.
+  const n = interpBuffer.length;
+  if (n < 2) return lastState;
+  const t = performance.now() - clockOffsetMs - renderDelayMs;
+  let i = n - 1;
+  while (i > 0 && interpBuffer[i - 1].time > t) i--;
+  if (i === 0) return interpBuffer[0].state;
+  const a = interpBuffer[i - 1];
+  const b = interpBuffer[i];
+  const span = b.time - a.time;
+  if (span <= 0) return b.state;
+  // Past the newest state (i === n - 1 and t > b.time) this extrapolates, capped.
+  const ahead = Math.min(t - a.time, span + INTERP_MAX_EXTRAPOLATE_MS);
+  const k = ahead / span;
+  const prevPlayers = new Map((a.state.players ?? []).map((p) => [p.player_id, p]));
+  const prevEntities = a.state.entities ?? [];
+  const sameLayout = prevEntities.length === (b.state.entities ?? []).length;
+  return {
+    ...lastState,
+    players: (b.state.players ?? []).map((p) => lerpFields(prevPlayers.get(p.player_id), p, k)),
+    entities: (b.state.entities ?? []).map((e, idx) => (sameLayout ? lerpFields(prevEntities[idx], e, k) : e)),
+  };
+}
+
+function stepMovement(pos, roleName, input, doorOpen) {
+  // Same rules as GameServer._simulate; each input moves the player for input_dt of server time.
+  const b = movement.bounds;
+  const speed = movement.speed[roleName] ?? 0;
+  let x = pos.x + input.move_x * speed * movement.input_dt;
+  let y = pos.y + input.move_y * speed * movement.input_dt;
+  x = Math.max(b.min_x, Math.min(b.max_x, x));
+  y = Math.max(b.min_y, Math.min(b.max_y, y));
+  if (!doorOpen) x = Math.min(x, movement.door_closed_max_x);
+  return { x, y };
+}
+
+function predictInput(input) {
+  if (!movement) return;
+  pendingInputs.push(input);
+  if (pendingInputs.length > PREDICTION_MAX_PENDING) pendingInputs.shift();
+  const me = (lastState?.players ?? []).find((p) => p.player_id === playerId);
+  if (!predicted || !me || me.down) return;
+  predicted = stepMovement(predicted, me.role, input, isDoorOpen(lastState));
+}
+
+function reconcile(state) {
+  const me = (state.players ?? []).find((p) => p.player_id === playerId);
+  if (!movement || !me) {
+    predicted = null;
     return;
   }
+  const acked = me.seq ?? Infinity;
+  pendingInputs = pendingInputs.filter((i) => i.seq > acked);
+  let pos = { x: me.x, y: me.y };
+  if (!me.down) {
+    const doorOpen = isDoorOpen(state);
+    for (const input of pendingInputs) pos = stepMovement(pos, me.role, input, doorOpen);
+  }
+  predicted = pos;
+}
+
+function predictedDrawPos() {
+  // Eases toward the prediction over one input period; large corrections (respawn, room change) snap.
+  const now = performance.now();
+  if (!shownPos || Math.hypot(predicted.x - shownPos.x, predicted.y - shownPos.y) > PREDICTION_SNAP_PX) {
+    shownPos = { ...predicted };
+  } else {
+    const k = Math.min(1, (now - shownAt) / (movement.input_dt * 1000));
+    shownPos = { x: shownPos.x + (predicted.x - shownPos.x) * k, y: shownPos.y + (predicted.y - shownPos.y) * k };
+  }
+  shownAt = now;
+  return shownPos;
+}
+
+function mergeMessages(incoming, tick) {
+  const fresh = incoming.filter((m) => m.id > msgAck);
+  if (!fresh.length) return fresh;
+  // Ticks stop while a room waits in the lobby or is paused, so pings and bubbles age by the
+  // local clock from when they arrived (less the ticks they already spent in flight).
+  const now = performance.now();
+  for (const m of fresh) m.at = now - Math.max(0, tick - (m.t ?? tick)) * tickMs;
+  msgAck = fresh[fresh.length - 1].id;
+  messageLog = messageLog.concat(fresh).slice(-MESSAGE_LOG_SIZE);
+  return fresh;
+}
+
+function applyStateDelta(base, delta) {
+  const state = {
+    type: "state",
+    tick: delta.tick,
+    room_index: delta.room_index ?? base.room_index,
+    players: base.players,
+    entities: base.entities,
+    messages: delta.messages,
+    ui: delta.ui ?? base.ui,
+  };
+
+  if (delta.players) {
+    const byId = new Map(base.players.map((p) => [p.player_id, p]));
+    for (const patch of delta.players) {
+      byId.set(patch.player_id, { ...byId.get(patch.player_id), ...patch });
+    }
+    state.players = [...byId.values()];
+  }
+
+  if (delta.entities) {
+    state.entities = base.entities.slice();
+    for (const [idx, patch] of delta.entities) {
+      state.entities[idx] = { ...state.entities[idx], ...patch };
+    }
+  }
+  return state;
 }
 
 function updateHud(state) {
@@ -638,15 +1014,20 @@ function computeMove() {
 function sendInputLoop() {
   if (joined) {
     const mv = computeMove();
-    send({
+    const input = {
       type: "input",
       seq: inputSeq++,
       move_x: mv.x,
       move_y: mv.y,
       interact: interactHeld,
-    });
-  }
-  setTimeout(sendInputLoop, 50);
+      ack: ackTick,
+      msg_ack: msgAck,
+    };
+    sendInput(input);
+    predictInput(input);
+  }
+  // One input per server input step once shared/movement.json is in; 50 ms until then.
+  setTimeout(sendInputLoop, movement ? movement.input_dt * 1000 : 50);
 }
 
 function worldPosFromCanvasEvent(evt) {
@@ -671,9 +1052,10 @@ function draw() {
 
   const roomIndex = lastState.room_index ?? 0;
   drawDungeonScene(roomIndex);
+  const view = interpolatedView();
 
   // entities
-  for (const e of lastState.entities ?? []) {
+  for (const e of view.entities ?? []) {
     drawEntity(e);
   }
 
@@ -682,9 +1064,14 @@ function draw() {
   // pings (draw before players so players can stand on them)
   drawPings();
 
-  // players
-  for (const p of lastState.players ?? []) {
-    drawPlayer(p);
+  // players (our own at its predicted position)
+  for (const p of view.players ?? []) {
+    if (p.player_id === playerId && predicted && !p.down) {
+      const pos = predictedDrawPos();
+      drawPlayer({ ...p, x: pos.x, y: pos.y });
+    } else {
+      drawPlayer(p);
+    }
   }
 
   // room label
@@ -696,35 +1083,46 @@ function draw() {
 }
 
 function drawDungeonScene(roomIndex) {
-  const patterns = getRoomPatterns(roomIndex);
-
-  // floor
-  ctx.fillStyle = patterns.floorPattern;
-  ctx.fillRect(0, 0, canvas.width, canvas.height);
-
-  // carve a "room" area with darker border like stone walls
-  drawWallsAndTrim(roomIndex, patterns.wallPattern);
+  let layer = renderCache.rooms.get(roomIndex);
+  if (!layer) {
+    layer = makeLayer(canvas.width, canvas.height, (g) => paintRoomLayer(g, roomIndex));
+    renderCache.rooms.set(roomIndex, layer);
+  }
+  ctx.drawImage(layer, 0, 0);
 
-  // torches + warm lighting
+  // torches + warm lighting, the only animated part of the scene
   drawTorches(roomIndex);
-
-  // subtle room-specific decals
-  drawDecals(roomIndex);
 }
 
-function getRoomPatterns(roomIndex) {
-  const key = `${roomIndex}`;
-  if (renderCache.patterns.has(key)) return renderCache.patterns.get(key);
+// Paint once into an offscreen surface: an ImageBitmap where OffscreenCanvas exists, else a canvas.
+function makeLayer(width, height, paint) {
+  if (typeof OffscreenCanvas !== "undefined") {
+    const off = new OffscreenCanvas(width, height);
+    paint(off.getContext("2d"));
+    return off.transferToImageBitmap();
+  }
+  const c = document.createElement("canvas");
+  c.width = width;
+  c.height = height;
+  paint(c.getContext("2d"));
+  return c;
+}
 
+function paintRoomLayer(g, roomIndex) {
   const seed = 1337 + roomIndex * 7919;
-  const floorPattern = makeStoneFloorPattern(seed);
-  const wallPattern = makeWallPattern(seed + 17);
-  const entry = { floorPattern, wallPattern };
-  renderCache.patterns.set(key, entry);
-  return entry;
+
+  // floor
+  g.fillStyle = g.createPattern(makeStoneFloorTile(seed), "repeat");
+  g.fillRect(0, 0, g.canvas.width, g.canvas.height);
+
+  // carve a "room" area with darker border like stone walls
+  drawWallsAndTrim(g, roomIndex, g.createPattern(makeWallTile(seed + 17), "repeat"));
+
+  // subtle room-specific decals (under the torch light, which is drawn per frame)
+  drawDecals(g, roomIndex);
 }
 
-function makeStoneFloorPattern(seed) {
+function makeStoneFloorTile(seed) {
   const c = document.createElement("canvas");
   c.width = 64;
   c.height = 64;
@@ -767,10 +1165,10 @@ function makeStoneFloorPattern(seed) {
     g.stroke();
   }
 
-  return ctx.createPattern(c, "repeat");
+  return c;
 }
 
-function makeWallPattern(seed) {
+function makeWallTile(seed) {
   const c = document.createElement("canvas");
   c.width = 64;
   c.height = 64;
@@ -792,35 +1190,36 @@ function makeWallPattern(seed) {
 
   g.strokeStyle = "rgba(0,0,0,0.35)";
   g.strokeRect(0.5, 0.5, 63, 63);
-  return ctx.createPattern(c, "repeat");
+  return c;
 }
 
-function drawWallsAndTrim(roomIndex, wallPattern) {
+function drawWallsAndTrim(g, roomIndex, wallPattern) {
+  const { width, height } = g.canvas;
   // outer walls
-  ctx.save();
-  ctx.fillStyle = wallPattern;
-  ctx.fillRect(0, 0, canvas.width, 36);
-  ctx.fillRect(0, canvas.height - 36, canvas.width, 36);
-  ctx.fillRect(0, 0, 36, canvas.height);
-  ctx.fillRect(canvas.width - 36, 0, 36, canvas.height);
-  ctx.restore();
+  g.save();
+  g.fillStyle = wallPattern;
+  g.fillRect(0, 0, width, 36);
+  g.fillRect(0, height - 36, width, 36);
+  g.fillRect(0, 0, 36, height);
+  g.fillRect(width - 36, 0, 36, height);
+  g.restore();
 
   // room-specific interior walls (purely visual, matches reference vibe)
   const walls = getInteriorWalls(roomIndex);
-  ctx.save();
-  ctx.fillStyle = wallPattern;
-  for (const r of walls) ctx.fillRect(r.x, r.y, r.w, r.h);
-  ctx.restore();
+  g.save();
+  g.fillStyle = wallPattern;
+  for (const r of walls) g.fillRect(r.x, r.y, r.w, r.h);
+  g.restore();
 
   // trim shadow
-  ctx.save();
-  ctx.globalAlpha = 0.35;
-  ctx.fillStyle = "#000";
-  ctx.fillRect(36, 36, canvas.width - 72, 6);
-  ctx.fillRect(36, canvas.height - 42, canvas.width - 72, 6);
-  ctx.fillRect(36, 36, 6, canvas.height - 72);
-  ctx.fillRect(canvas.width - 42, 36, 6, canvas.height - 72);
-  ctx.restore();
+  g.save();
+  g.globalAlpha = 0.35;
+  g.fillStyle = "#000";
+  g.fillRect(36, 36, width - 72, 6);
+  g.fillRect(36, height - 42, width - 72, 6);
+  g.fillRect(36, 36, 6, height - 72);
+  g.fillRect(width - 42, 36, 6, height - 72);
+  g.restore();
 }
 
 function getInteriorWalls(roomIndex) {
@@ -868,19 +1267,12 @@ function drawTorches(roomIndex) {
 
 function drawTorch(x, y, t, roomIndex) {
   const flick = 0.8 + 0.2 * Math.sin(t * 9 + x * 0.01 + roomIndex);
-  const r = 120 * flick;
+  const r = TORCH_GLOW_R * flick;
 
-  // warm light
+  // warm light: the cached glow, scaled with the flicker
   ctx.save();
   ctx.globalCompositeOperation = "lighter";
-  const g = ctx.createRadialGradient(x, y, 6, x, y, r);
-  g.addColorStop(0, "rgba(255, 204, 120, 0.45)");
-  g.addColorStop(0.4, "rgba(255, 140, 50, 0.18)");
-  g.addColorStop(1, "rgba(0,0,0,0)");
-  ctx.fillStyle = g;
-  ctx.beginPath();
-  ctx.arc(x, y, r, 0, Math.PI * 2);
-  ctx.fill();
+  ctx.drawImage(torchGlow(), x - r, y - r, r * 2, r * 2);
   ctx.restore();
 
   // torch sprite (simple pixel-ish)
@@ -914,22 +1306,39 @@ function drawTorch(x, y, t, roomIndex) {
   ctx.restore();
 }
 
-function drawDecals(roomIndex) {
-  ctx.save();
-  ctx.globalAlpha = 0.2;
+function torchGlow() {
+  if (!renderCache.torchGlow) {
+    const r = TORCH_GLOW_R;
+    renderCache.torchGlow = makeLayer(r * 2, r * 2, (g) => {
+      const grad = g.createRadialGradient(r, r, 6, r, r, r);
+      grad.addColorStop(0, "rgba(255, 204, 120, 0.45)");
+      grad.addColorStop(0.4, "rgba(255, 140, 50, 0.18)");
+      grad.addColorStop(1, "rgba(0,0,0,0)");
+      g.fillStyle = grad;
+      g.beginPath();
+      g.arc(r, r, r, 0, Math.PI * 2);
+      g.fill();
+    });
+  }
+  return renderCache.torchGlow;
+}
+
+function drawDecals(g, roomIndex) {
+  g.save();
+  g.globalAlpha = 0.2;
   if (roomIndex === 1) {
     // rune strip under mural area
-    ctx.fillStyle = "#ffd479";
-    for (let i = 0; i < 7; i++) ctx.fillRect(320 + i * 22, 90, 10, 3);
+    g.fillStyle = "#ffd479";
+    for (let i = 0; i < 7; i++) g.fillRect(320 + i * 22, 90, 10, 3);
   } else if (roomIndex === 4) {
     // big rune circle at center
-    ctx.strokeStyle = "#ffd479";
-    ctx.lineWidth = 3;
-    ctx.beginPath();
-    ctx.arc(480, 270, 90, 0, Math.PI * 2);
-    ctx.stroke();
+    g.strokeStyle = "#ffd479";
+    g.lineWidth = 3;
+    g.beginPath();
+    g.arc(480, 270, 90, 0, Math.PI * 2);
+    g.stroke();
   }
-  ctx.restore();
+  g.restore();
 }
 
 function drawRoomBanner(roomIndex) {
@@ -964,26 +1373,25 @@ function hash01(seed, x, y) {
 }
 
 function drawVignette() {
-  const g = ctx.createRadialGradient(
-    canvas.width / 2,
-    canvas.height / 2,
-    200,
-    canvas.width / 2,
-    canvas.height / 2,
-    520
-  );
-  g.addColorStop(0, "rgba(0,0,0,0)");
-  g.addColorStop(1, "rgba(0,0,0,0.45)");
-  ctx.fillStyle = g;
-  ctx.fillRect(0, 0, canvas.width, canvas.height);
+  if (!renderCache.vignette) renderCache.vignette = makeLayer(canvas.width, canvas.height, paintVignette);
+  ctx.drawImage(renderCache.vignette, 0, 0);
+}
+
+function paintVignette(g) {
+  const { width, height } = g.canvas;
+  const grad = g.createRadialGradient(width / 2, height / 2, 200, width / 2, height / 2, 520);
+  grad.addColorStop(0, "rgba(0,0,0,0)");
+  grad.addColorStop(1, "rgba(0,0,0,0.45)");
+  g.fillStyle = grad;
+  g.fillRect(0, 0, width, height);
 }
 
 function drawPings() {
-  const tick = lastState.tick ?? 0;
+  const now = performance.now();
   const msgs = lastState.messages ?? [];
   for (const m of msgs) {
     if (m.kind !== "ping") continue;
-    const age = (tick - (m.t ?? tick)) / 20;
+    const age = (now - (m.at ?? now)) / 1000;
     if (age < 0 || age > 2.0) continue;
     const alpha = 1.0 - age / 2.0;
     const x = m.x ?? 0;
@@ -1269,12 +1677,12 @@ function drawPlayerLabel(p) {
 }
 
 function drawSpeechBubbles() {
-  const tick = lastState.tick ?? 0;
+  const now = performance.now();
   const msgs = lastState.messages ?? [];
   const latestByPlayer = new Map();
   for (const m of msgs) {
     if (m.kind !== "chat") continue;
-    const age = (tick - (m.t ?? tick)) / 20;
+    const age = (now - (m.at ?? now)) / 1000;
     if (age < 0 || age > 3.0) continue;
     latestByPlayer.set(m.player_id, m);
   }
@@ -1404,7 +1812,7 @@ function isPlatePressed(plate) {
 }
 
 // UI events
-connectBtn.addEventListener("click", connect);
+connectBtn.addEventListener("click", () => connect());
 
 readyBtn.addEventListener("click", () => {
   if (!joined) return;
@@ -1428,6 +1836,11 @@ for (const btn of document.querySelectorAll("button.qc")) {
   });
 }
 
+function wake() {
+  if (asleep) connect(true);
+}
+window.addEventListener("pointerdown", wake);
+
 canvas.addEventListener("click", (evt) => {
   if (!joined) return;
   const pos = worldPosFromCanvasEvent(evt);
@@ -1436,6 +1849,7 @@ canvas.addEventListener("click", (evt) => {
 });
 
 window.addEventListener("keydown", (evt) => {
+  wake();
   keys.add(evt.code);
   if (evt.code === "KeyE") interactHeld = true;
   if (evt.code === "KeyE" && audio.enabled) audio.sfxInteract();
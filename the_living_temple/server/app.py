@@ -1,29 +1,124 @@
 from __future__ import annotations
 
+import os
+from dataclasses import asdict
 from pathlib import Path
 
 from fastapi import FastAPI, WebSocket
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
-from .game_server import GameServer
+from .game_server import HIBERNATE_IDLE_S, NET_HZ, RESUME_GRACE_S, TICK_HZ, GameServer
+from .hibernate import RoomStore
+from .metrics import REGISTRY
+from .replay import Recorder
+from .sharding import HashRing, Shard
 
 
 ROOT = Path(__file__).resolve().parent
 CLIENT_DIR = (ROOT.parent / "client").resolve()
+SHARED_DIR = (ROOT.parent / "shared").resolve()
+
+
+def _shard_from_env() -> Shard | None:
+    # Set by `python -m server.cluster` for each worker process.
+    count = int(os.environ.get("LT_WORKER_COUNT", "1"))
+    if count <= 1:
+        return None
+    return Shard(index=int(os.environ["LT_WORKER_INDEX"]), ring=HashRing(count))
+
+
+def _rates_from_env() -> tuple[int, int]:
+    # LT_SIM_HZ: simulation ticks per second; LT_NET_HZ: max state sends per second per client.
+    sim_hz = int(os.environ.get("LT_SIM_HZ", TICK_HZ))
+    net_hz = int(os.environ.get("LT_NET_HZ", min(NET_HZ, sim_hz)))
+    return sim_hz, net_hz
+
+
+def _resume_grace_from_env() -> float:
+    # LT_RESUME_GRACE_S: seconds a dropped player's seat is held for a resume; 0 disables resuming.
+    return float(os.environ.get("LT_RESUME_GRACE_S", RESUME_GRACE_S))
+
+
+def _hibernation_from_env() -> tuple[RoomStore | None, float, int]:
+    # LT_HIBERNATE_DIR: hibernate idle lobbies there (see server/hibernate.py), kept LT_HIBERNATE_TTL_S.
+    # LT_HIBERNATE_IDLE_S: lobby idle time before that; LT_MAX_RESIDENT_ROOMS: while more rooms than this
+    # are in memory, idle lobbies go early, least recently active first (0: no cap). Players come back
+    # through their resume tokens, so this needs LT_RESUME_GRACE_S > 0.
+    directory = os.environ.get("LT_HIBERNATE_DIR")
+    store = RoomStore(Path(directory), float(os.environ.get("LT_HIBERNATE_TTL_S", 24 * 3600))) if directory else None
+    idle_s = float(os.environ.get("LT_HIBERNATE_IDLE_S", HIBERNATE_IDLE_S))
+    max_resident = int(os.environ.get("LT_MAX_RESIDENT_ROOMS", 0))
+    return store, idle_s, max_resident
+
+
+def _recorder_from_env(sim_hz: int, resume_grace: float) -> Recorder | None:
+    # LT_RECORD_DIR: write a replayable log per room there (see server/replay.py).
+    directory = os.environ.get("LT_RECORD_DIR")
+    if not directory:
+        return None
+    return Recorder(Path(directory), sim_hz, resume_grace)
 
 
 app = FastAPI(title="The Living Temple Server")
-game = GameServer()
+sim_hz, net_hz = _rates_from_env()
+resume_grace = _resume_grace_from_env()
+store, idle_s, max_resident = _hibernation_from_env()
+game = GameServer(
+    shard=_shard_from_env(),
+    sim_hz=sim_hz,
+    net_hz=net_hz,
+    recorder=_recorder_from_env(sim_hz, resume_grace),
+    resume_grace=resume_grace,
+    store=store,
+    idle_s=idle_s,
+    max_resident=max_resident,
+)
+
+# Read from the live server at scrape time only.
+REGISTRY.callback(
+    "lt_rooms",
+    "Rooms hosted by this worker, by state.",
+    lambda: {
+        ("started",): game.active_room_count,
+        ("paused",): game.paused_room_count,
+        ("lobby",): game.room_count - game.active_room_count - game.paused_room_count,
+    },
+    labels=("state",),
+)
+REGISTRY.callback("lt_connections", "Joined connections.", lambda: game.connection_count)
+if store is not None:
+    REGISTRY.callback("lt_hibernated_rooms", "Rooms in the hibernation store.", lambda: len(store))
+REGISTRY.callback("lt_outbox_queued_frames", "Frames waiting in all outboxes.", lambda: sum(game.outbox_depths()))
+REGISTRY.callback(
+    "lt_outbox_queued_frames_max", "Frames waiting in the fullest outbox.", lambda: max(game.outbox_depths(), default=0)
+)
+REGISTRY.callback("lt_ticks_total", "Scheduler ticks.", lambda: game.tick_stats.ticks, kind="counter")
+REGISTRY.callback(
+    "lt_late_ticks_total", "Ticks that fired more than one tick late.", lambda: game.tick_stats.late_ticks, kind="counter"
+)
 
 
 @app.get("/health")
 def health() -> dict:
-    return {"ok": True}
+    return {
+        "ok": True,
+        "rooms": game.room_count,
+        "active_rooms": game.active_room_count,
+        "tick": asdict(game.tick_stats),
+    }
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    # async so the callbacks walk rooms on the event loop, not from a threadpool thread.
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 if CLIENT_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(CLIENT_DIR)), name="static")
+# Movement rules and room data the client reads at startup.
+app.mount("/shared", StaticFiles(directory=str(SHARED_DIR)), name="shared")
 
 
 @app.get("/")
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import struct
+from typing import Any
+
+from .snapshots import Snapshot
+
+
+# Protocol version that enables binary `input`/`state` frames (see "x-binary" in shared/schema.json).
+BINARY_VERSION = 2
+
+FRAME_INPUT = 1
+FRAME_KEYFRAME = 2
+FRAME_DELTA = 3
+
+# Positions and sizes are sent in 1/8 px units.
+POS_SCALE = 8.0
+# Movement axes are sent as int8 in [-127, 127].
+MOVE_SCALE = 127.0
+# revive_progress (seconds, 0..3.5) is sent as uint8 in 1/50 s units.
+REVIVE_SCALE = 50.0
+# Input seqs come back in the player record's i32, so larger ones are refused on the way in.
+MAX_SEQ = 2**31 - 1
+
+ROLES = ("guardian", "scholar")
+ENTITY_TYPES = ("door", "plate", "spikes", "mural", "lever", "block", "switch", "valve", "water", "panel", "sign")
+ENTITY_FLAGS = ("open", "active", "read", "on", "grabbed")
+
+_ROLE_CODES = {name: i for i, name in enumerate(ROLES)}
+_ENTITY_CODES = {name: i for i, name in enumerate(ENTITY_TYPES)}
+
+INPUT = struct.Struct("<BIbbBiI")  # kind, seq, move_x, move_y, flags, ack, msg_ack
+INPUT_PREV = struct.Struct("<IbbB")  # seq, move_x, move_y, flags: earlier inputs repeated after INPUT
+HEADER = struct.Struct("<BIiBBB")  # kind, tick, base_tick, room_index, n_players, n_entities
+PLAYER = struct.Struct("<BBHHBBi")  # player_id, flags, x, y, hp, revive, seq
+ENTITY = struct.Struct("<BBBbhhHH")  # index, type, flags, state, x, y, w, h
+TAIL_LEN = struct.Struct("<H")
+
+PLAYER_DOWN = 1
+PLAYER_READY = 2
+INPUT_INTERACT = 1
+
+
+def decode_input(data: bytes) -> dict[str, Any] | None:
+    """Turn a binary input frame into the same dict the JSON path produces."""
+    extra = len(data) - INPUT.size
+    if extra < 0 or extra % INPUT_PREV.size or data[0] != FRAME_INPUT:
+        return None
+    _, seq, mx, my, flags, ack, msg_ack = INPUT.unpack_from(data)
+    if seq > MAX_SEQ:
+        return None
+    msg: dict[str, Any] = {
+        "type": "input",
+        "seq": seq,
+        "move_x": mx / MOVE_SCALE,
+        "move_y": my / MOVE_SCALE,
+        "interact": bool(flags & INPUT_INTERACT),
+        "ack": ack,
+        "msg_ack": msg_ack,
+    }
+    if extra:
+        inputs = [
+            [p_seq, p_mx / MOVE_SCALE, p_my / MOVE_SCALE, bool(p_flags & INPUT_INTERACT)]
+            for p_seq, p_mx, p_my, p_flags in INPUT_PREV.iter_unpack(data[INPUT.size :])
+        ]
+        if any(entry[0] > MAX_SEQ for entry in inputs):
+            return None
+        inputs.append([seq, msg["move_x"], msg["move_y"], msg["interact"]])
+        msg["inputs"] = inputs
+    return msg
+
+
+def _q(v: Any) -> int:
+    return int(round(float(v or 0) * POS_SCALE))
+
+
+def _pack_player(p: dict[str, Any]) -> bytes:
+    flags = (PLAYER_DOWN if p["down"] else 0) | (PLAYER_READY if p["ready"] else 0)
+    flags |= _ROLE_CODES.get(p["role"], 0) << 2
+    revive = min(255, int(p["revive_progress"] * REVIVE_SCALE))
+    hp = max(0, min(255, p["hp"]))
+    return PLAYER.pack(p["player_id"], flags, _q(p["x"]), _q(p["y"]), hp, revive, p.get("seq", -1))
+
+
+def _pack_entity(idx: int, e: dict[str, Any]) -> bytes:
+    flags = 0
+    for bit, name in enumerate(ENTITY_FLAGS):
+        if e.get(name):
+            flags |= 1 << bit
+    return ENTITY.pack(
+        idx,
+        _ENTITY_CODES.get(e.get("type", ""), 255),
+        flags,
+        int(e.get("state", 0)),
+        _q(e.get("x")),
+        _q(e.get("y")),
+        _q(e.get("w")),
+        _q(e.get("h")),
+    )
+
+
+def encode_state(snap: Snapshot, delta: dict[str, Any] | None) -> bytes:
+    """Header, player and entity records for a keyframe, or for the records named in `delta`.
+
+    Delta frames carry whole records for every changed player/entity rather than
+    individual fields; the records are small enough that a field mask is not worth it.
+    """
+    if delta is None:
+        players = list(snap.players.values())
+        entities = list(enumerate(snap.entities))
+        header = HEADER.pack(FRAME_KEYFRAME, snap.tick, -1, snap.room_index, len(players), len(entities))
+    else:
+        players = [snap.players[p["player_id"]] for p in delta.get("players", [])]
+        entities = [(idx, snap.entities[idx]) for idx, _ in delta.get("entities", [])]
+        header = HEADER.pack(
+            FRAME_DELTA, snap.tick, delta["base_tick"], snap.room_index, len(players), len(entities)
+        )
+    parts = [header]
+    parts.extend(_pack_player(p) for p in players)
+    parts.extend(_pack_entity(idx, e) for idx, e in entities)
+    return b"".join(parts)
+
+
+def check_entity_types(room_index: int, entities: list[dict[str, Any]]) -> None:
+    """Encode a keyframe of a room's entities and read each type back; ValueError if one does not survive.
+
+    A type missing from ENTITY_TYPES would otherwise go out as 255 and reach clients as undefined.
+    """
+    snap = Snapshot(tick=0, epoch=0, room_index=room_index, players={}, entities=entities)
+    records = encode_state(snap, None)[HEADER.size :]
+    for e, (_, code, *_rest) in zip(entities, ENTITY.iter_unpack(records)):
+        decoded = ENTITY_TYPES[code] if code < len(ENTITY_TYPES) else None
+        if decoded != e["type"]:
+            raise ValueError(f"room {room_index}: entity type {e['type']!r} has no binary code (binary.ENTITY_TYPES)")
+
+
+def encode_tail(tail: bytes) -> bytes:
+    """Length-prefixed UTF-8 JSON object with the per-connection `ui`/`messages` fields."""
+    return TAIL_LEN.pack(len(tail)) + tail
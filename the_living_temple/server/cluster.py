@@ -0,0 +1,198 @@
+"""Multi-process mode: N GameServer workers behind a WebSocket router.
+
+Run from repo root:
+
+    python -m server.cluster --workers 4 --port 8000
+
+Each worker is a plain `uvicorn server.app:app` on a local port, told its
+shard via LT_WORKER_INDEX / LT_WORKER_COUNT. The router reads the client's
+first frames up to `join`, picks the worker that owns the room code on the
+shared HashRing (or the next worker round-robin when creating a room, which
+then generates a code it owns) and proxies the socket to it unchanged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import uvicorn
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+from websockets.asyncio.client import ClientConnection, connect
+
+from .sharding import HashRing
+
+
+ROOT = Path(__file__).resolve().parent
+CLIENT_DIR = (ROOT.parent / "client").resolve()
+SHARED_DIR = (ROOT.parent / "shared").resolve()
+
+# Clients send hello + join right away; anything chattier before join is dropped.
+MAX_PREJOIN_FRAMES = 4
+CONNECT_ATTEMPTS = 5
+
+
+async def _connect_worker(url: str) -> ClientConnection:
+    for attempt in range(CONNECT_ATTEMPTS):
+        try:
+            return await connect(url, compression=None, max_size=None)
+        except OSError:
+            # Workers may still be booting right after the cluster starts.
+            if attempt == CONNECT_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(0.2 * (attempt + 1))
+    raise AssertionError("unreachable")
+
+
+def _client_close_code(code: int | None) -> int:
+    # The worker's own codes (4009 resumed elsewhere, 4010 hibernated, ...) steer the client, so pass
+    # them on. 1005/1006 only report a missing or abnormal close and may not be sent.
+    if code is None or code == 1005:
+        return 1000
+    if code == 1006:
+        return 1011
+    return code
+
+
+async def _pipe(ws: WebSocket, upstream: ClientConnection) -> None:
+    async def client_to_worker() -> None:
+        while True:
+            frame = await ws.receive()
+            if frame["type"] == "websocket.disconnect":
+                return
+            data = frame.get("bytes")
+            await upstream.send(data if data is not None else frame["text"])
+
+    async def worker_to_client() -> None:
+        async for data in upstream:
+            if isinstance(data, bytes):
+                await ws.send_bytes(data)
+            else:
+                await ws.send_text(data)
+
+    tasks = [asyncio.create_task(client_to_worker()), asyncio.create_task(worker_to_client())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def create_router(worker_urls: list[str], lifespan: Any = None) -> FastAPI:
+    ring = HashRing(len(worker_urls))
+    round_robin = itertools.cycle(range(len(worker_urls)))
+    app = FastAPI(title="The Living Temple Router", lifespan=lifespan)
+
+    @app.get("/health")
+    def health() -> dict:
+        return {"ok": True, "workers": len(worker_urls)}
+
+    if CLIENT_DIR.exists():
+        app.mount("/static", StaticFiles(directory=str(CLIENT_DIR)), name="static")
+    # Movement rules and room data the client reads at startup.
+    app.mount("/shared", StaticFiles(directory=str(SHARED_DIR)), name="shared")
+
+    @app.get("/")
+    def index():
+        index_path = CLIENT_DIR / "index.html"
+        if index_path.exists():
+            return FileResponse(str(index_path))
+        return {"ok": True, "message": "Client not found. Build/serve client/index.html."}
+
+    @app.websocket("/ws")
+    async def ws_endpoint(ws: WebSocket) -> None:
+        await ws.accept()
+        pending: list[Any] = []
+        worker: int | None = None
+        while worker is None:
+            frame = await ws.receive()
+            if frame["type"] == "websocket.disconnect":
+                return
+            data = frame.get("bytes")
+            pending.append(data if data is not None else frame["text"])
+            if data is None:
+                try:
+                    msg = json.loads(frame["text"])
+                except ValueError:
+                    msg = {}
+                if isinstance(msg, dict) and msg.get("type") == "join":
+                    code = (msg.get("room_code") or "").strip().upper()
+                    worker = ring.owner(code) if code else next(round_robin)
+                    break
+            if len(pending) >= MAX_PREJOIN_FRAMES:
+                await ws.close(code=1008)
+                return
+
+        try:
+            upstream = await _connect_worker(worker_urls[worker])
+        except OSError:
+            await ws.close(code=1011)
+            return
+        try:
+            for data in pending:
+                await upstream.send(data)
+            await _pipe(ws, upstream)
+        finally:
+            await upstream.close()
+            try:
+                await ws.close(code=_client_close_code(upstream.close_code), reason=upstream.close_reason or "")
+            except Exception:
+                pass
+
+    return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run several game server workers behind one router.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-base-port", type=int, default=None, help="default: --port + 1")
+    args = parser.parse_args(argv)
+
+    base_port = args.worker_base_port or args.port + 1
+    procs: list[subprocess.Popen] = []
+    for i in range(args.workers):
+        env = dict(os.environ, LT_WORKER_INDEX=str(i), LT_WORKER_COUNT=str(args.workers))
+        cmd = [
+            sys.executable, "-m", "uvicorn", "server.app:app",
+            "--host", "127.0.0.1", "--port", str(base_port + i), "--log-level", "warning",
+        ]
+        procs.append(subprocess.Popen(cmd, env=env, cwd=str(ROOT.parent)))
+
+    def stop_workers() -> None:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    # uvicorn re-raises SIGTERM after a graceful shutdown, so workers are
+    # stopped from the router's lifespan rather than only after run() returns.
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        yield
+        stop_workers()
+
+    worker_urls = [f"ws://127.0.0.1:{base_port + i}/ws" for i in range(args.workers)]
+    try:
+        uvicorn.run(create_router(worker_urls, lifespan=lifespan), host=args.host, port=args.port)
+    finally:
+        stop_workers()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional fast backend
+    orjson = None
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    BACKEND = "json"
+    dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+    loads = json.loads
+
+
+def encode_field(key: str, value: Any) -> str:
+    return f'"{key}":{dumps(value)}'
+
+
+def splice(body: str, *fields: str) -> str:
+    """Close an encoded object (cut before its final brace) after appending `encode_field` parts."""
+    if not fields:
+        return body + "}"
+    return body + "," + ",".join(fields) + "}"
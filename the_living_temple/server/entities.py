@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Any
+
+
+# Optional per-type state, sent only once set (None = absent from the wire dict).
+OPTIONAL_FIELDS = ("active", "open", "state", "read", "on", "grabbed")
+_TRACKED_ORDER = ("x", "y", "w", "h") + OPTIONAL_FIELDS
+_TRACKED = frozenset(_TRACKED_ORDER)
+
+
+class Entity:
+    """Slotted room entity with a small integer id and a cached wire dict.
+
+    Writes to tracked fields bump `rev` only when the value actually changes;
+    `wire()` rebuilds its dict only after such a change, so unchanged entities
+    serialize into snapshots without allocating and can be diffed by identity.
+    """
+
+    __slots__ = ("eid", "key", "type", "x", "y", "w", "h", *OPTIONAL_FIELDS, "rev", "_wire", "_wire_rev")
+
+    def __init__(
+        self,
+        key: str | None,
+        type: str,
+        x: float,
+        y: float,
+        w: float = 0,
+        h: float = 0,
+        **optional: Any,
+    ) -> None:
+        init = object.__setattr__
+        init(self, "eid", -1)
+        init(self, "key", key)
+        init(self, "type", type)
+        init(self, "x", x)
+        init(self, "y", y)
+        init(self, "w", w)
+        init(self, "h", h)
+        for name in OPTIONAL_FIELDS:
+            init(self, name, optional.pop(name, None))
+        if optional:
+            raise TypeError(f"unknown entity fields: {sorted(optional)}")
+        init(self, "rev", 0)
+        init(self, "_wire", None)
+        init(self, "_wire_rev", -1)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _TRACKED:
+            if getattr(self, name) == value:
+                return
+            object.__setattr__(self, "rev", self.rev + 1)
+        object.__setattr__(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"Entity({self.eid}, {self.key or self.type!r}, rev={self.rev})"
+
+    def save(self) -> tuple[Any, ...]:
+        """Values of every tracked field, in a form `restore()` accepts."""
+        return tuple(getattr(self, name) for name in _TRACKED_ORDER)
+
+    def restore(self, saved: tuple[Any, ...]) -> None:
+        # Goes through __setattr__, so only fields that differ bump rev and drop the wire cache.
+        for name, value in zip(_TRACKED_ORDER, saved):
+            setattr(self, name, value)
+
+    def wire(self) -> dict[str, Any]:
+        # The cached dict is replaced, never mutated, so older snapshots holding it stay valid.
+        if self._wire_rev != self.rev:
+            d: dict[str, Any] = {"id": self.key} if self.key else {}
+            d["type"] = self.type
+            d["x"] = self.x
+            d["y"] = self.y
+            d["w"] = self.w
+            d["h"] = self.h
+            for name in OPTIONAL_FIELDS:
+                v = getattr(self, name)
+                if v is not None:
+                    d[name] = v
+            object.__setattr__(self, "_wire", d)
+            object.__setattr__(self, "_wire_rev", self.rev)
+        return self._wire
+
+
+def index_entities(entities: list[Entity]) -> list[Entity]:
+    """Assign each entity its position in the room's entity list as its id."""
+    for eid, ent in enumerate(entities):
+        object.__setattr__(ent, "eid", eid)
+    return entities
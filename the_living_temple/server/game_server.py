@@ -4,41 +4,126 @@ import asyncio
 import random
 import secrets
 import time
-from dataclasses import dataclass, field
-from typing import Any
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from typing import Any, Awaitable, Callable
 
 from fastapi import WebSocket
 
-from .rooms import ROOM_COUNT, build_room, reset_room_runtime_state, room_apply_interact, room_tick
+from .binary import BINARY_VERSION, check_entity_types, decode_input, encode_state, encode_tail
+from .codec import dumps, encode_field, splice
+from .hibernate import RoomStore, storable
+from .metrics import (
+    JOIN_SECONDS,
+    RATE_LIMIT_DISCONNECTS,
+    RATE_LIMITED,
+    REJECTED_MESSAGES,
+    ROOMS_HIBERNATED,
+    ROOMS_RESTORED,
+    SIMULATE_SECONDS,
+    STATE_FRAME_BYTES,
+)
+from .outbox import Outbox
+from .ratelimit import INVALID, RateLimiter
+from .replay import Recorder, RoomLog
+from .room_defs import RoomDef, load_movement
+from .rooms import (
+    ROOM_COUNT,
+    ROOM_DEFS,
+    build_room,
+    reset_room_runtime_state,
+    restore_room_runtime,
+    room_apply_interact,
+    room_tick,
+    save_room_runtime,
+)
+from .scheduler import TickScheduler, TickStats
+from .schema import MAX_MESSAGE_CHARS, BadMessage, parse_message, sniff_type
+from .sharding import Shard
+from .snapshots import KEYFRAME, Snapshot, SnapshotHistory, delta_payload, keyframe_payload
 from .util import clamp, dist2, normalize
 
 
+# Default simulation and broadcast rates; app.py takes LT_SIM_HZ / LT_NET_HZ.
 TICK_HZ = 20
-DT = 1.0 / TICK_HZ
+NET_HZ = 20
+# Adaptive per-connection broadcast never drops below this rate.
+MIN_NET_HZ = 5
+# RTT above this stretches a connection's broadcast interval proportionally.
+RTT_TARGET = 0.15
+# A send that takes longer than this (or a state frame conflated unsent) means the socket is backing up.
+BACKPRESSURE_S = 0.02
+# Sent-tick timestamps kept per connection for RTT samples.
+SENT_TRACK = 32
 ROOM_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+MESSAGE_BUFFER = 25
+MOVEMENT = load_movement()
+# Inputs held per connection; each one drives MOVEMENT.input_dt of movement.
+INPUT_BUFFER = 8
+# Beyond this many queued inputs the oldest are folded away so latency can't build up.
+INPUT_BACKLOG = 3
+# Most redundant inputs read from one `input` frame.
+MAX_REDUNDANT_INPUTS = 4
+# Seconds a dropped player's seat is held for a resume (app.py takes LT_RESUME_GRACE_S); 0 frees it at once.
+RESUME_GRACE_S = 20.0
+# Close code for a socket whose seat was resumed from another connection.
+RESUMED_ELSEWHERE_CLOSE = 4009
+# Hibernation (app.py takes LT_HIBERNATE_*): lobbies idle this long go to the store. Over the
+# resident-room budget, the least recently active go early, but never before HIBERNATE_MIN_IDLE_S.
+HIBERNATE_IDLE_S = 300.0
+HIBERNATE_MIN_IDLE_S = 30.0
+HIBERNATE_SWEEP_S = 5.0
+# Expired store entries are pruned every this many sweeps.
+HIBERNATE_PRUNE_EVERY = 60
+# Close code for sockets of a room that was hibernated; the client resumes on its next input.
+HIBERNATED_CLOSE = 4010
+# Close code for a connection that kept sending faster than its rate limits (see ratelimit.py).
+RATE_LIMITED_CLOSE = 4011
+# Every entity type the rooms use has to round-trip through binary state frames.
+for _index in range(ROOM_COUNT):
+    check_entity_types(_index, [e.wire() for e in build_room(_index, {"frag": "", "hint": ""})[1]["entities"]])
+# Histogram children resolved once so the per-tick path skips the label lookup.
+_SIMULATE_SECONDS = tuple(SIMULATE_SECONDS.labels(i) for i in range(ROOM_COUNT))
 
 
 def _gen_room_code() -> str:
     return "".join(secrets.choice(ROOM_CODE_ALPHABET) for _ in range(5))
 
 
-async def _safe_send(ws: WebSocket, msg: dict[str, Any]) -> None:
-    try:
-        await ws.send_json(msg)
-    except Exception:
-        pass
-
-
 @dataclass
 class PlayerConn:
     ws: WebSocket
     player_id: int
     role: str
     name: str = ""
-    last_seq: int = 0
+    delta: bool = False
+    binary: bool = False
+    # Highest input seq queued; anything at or below it is stale or a redundant copy.
+    last_seq: int = -1
+    # Seq of the input driving the current tick.
+    processed_seq: int = -1
+    ack_tick: int = -1
+    msg_ack: int = 0
+    # (seq, move_x, move_y, interact), oldest first; drained once per tick.
+    inputs: deque[tuple[int, float, float, bool]] = field(default_factory=lambda: deque(maxlen=INPUT_BUFFER))
+    # Simulated time not yet covered by a drained input.
+    input_clock: float = 0.0
     move_x: float = 0.0
     move_y: float = 0.0
+    # This tick's movement: one direction per input due, each held for MOVEMENT.input_dt.
+    moves: list[tuple[float, float]] = field(default_factory=list)
     interact_held: bool = False
+    # Ticks between state sends (fractional while adapting) and the next tick one is due.
+    send_every: float = 1.0
+    next_send_tick: int = 0
+    rtt: float | None = None
+    sent_at: dict[int, float] = field(default_factory=dict)
+    # Everything after join goes through here; started by _handle_join.
+    outbox: Outbox = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.outbox = Outbox(self.ws)
 
 
 @dataclass
@@ -52,6 +137,8 @@ class PlayerState:
     ready: bool = False
     revive_progress: float = 0.0
     damage_cd: dict[str, float] = field(default_factory=dict)
+    # Sent in `joined`; a `join` carrying it takes the seat back. Replaced on every (re)join.
+    resume_token: str = ""
 
 
 @dataclass
@@ -64,126 +151,552 @@ class Room:
     conns: dict[int, PlayerConn] = field(default_factory=dict)
     players: dict[int, PlayerState] = field(default_factory=dict)
     room_index: int = 0
+    # Counts simulated ticks only; lobbies and paused rooms are not stepped, so it stands still there.
     tick: int = 0
+    # Simulated seconds; rooms.py times everything off this rather than ticks.
+    time: float = 0.0
     started: bool = False
-    messages: list[dict[str, Any]] = field(default_factory=list)
-    room_static: dict[str, Any] = field(default_factory=dict)
+    # Bumped whenever the roster or entity layout changes; deltas never cross epochs.
+    epoch: int = 0
+    messages: deque[dict[str, Any]] = field(default_factory=lambda: deque(maxlen=MESSAGE_BUFFER))
+    next_msg_id: int = 1
+    # Shared, immutable layout of the current room (see shared/rooms.json).
+    room_static: RoomDef | None = None
     room_runtime: dict[str, Any] = field(default_factory=dict)
-    task: asyncio.Task | None = None
+    history: SnapshotHistory = field(default_factory=SnapshotHistory)
+    # Guards seating/unseating; set `closed` once the room has left the registry.
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    closed: bool = False
+    # Set when recording is on (LT_RECORD_DIR); see replay.py.
+    record: RoomLog | None = None
+    # Seats whose socket dropped, kept for a resume: player_id -> task that releases it on expiry.
+    # The room does not tick while any are away.
+    away: dict[int, asyncio.Task[None]] = field(default_factory=dict)
+    # time.monotonic() of the last join, ready, chat, ping, code submit or non-idle input.
+    # (A lambda: in this class body `time` is the field above, not the module.)
+    last_active: float = field(default_factory=lambda: time.monotonic())
+
+    def add_message(self, msg: dict[str, Any]) -> None:
+        msg["id"] = self.next_msg_id
+        self.next_msg_id += 1
+        self.messages.append(msg)
+
+    def messages_after(self, msg_id: int) -> list[dict[str, Any]]:
+        # Ids are consecutive, so the unacked tail starts at a computable offset.
+        if not self.messages:
+            return []
+        start = msg_id + 1 - self.messages[0]["id"]
+        if start <= 0:
+            return list(self.messages)
+        return list(islice(self.messages, start, None))
 
     def broadcast(self, msg: dict[str, Any]) -> None:
-        for conn in list(self.conns.values()):
-            asyncio.create_task(_safe_send(conn.ws, msg))
+        frame = dumps(msg)
+        for conn in self.conns.values():
+            conn.outbox.put_event(frame)
 
 
 class GameServer:
-    def __init__(self) -> None:
-        self._lock = asyncio.Lock()
+    def __init__(
+        self,
+        shard: Shard | None = None,
+        sim_hz: int = TICK_HZ,
+        net_hz: int = NET_HZ,
+        recorder: Recorder | None = None,
+        resume_grace: float = RESUME_GRACE_S,
+        store: RoomStore | None = None,
+        idle_s: float = HIBERNATE_IDLE_S,
+        max_resident: int = 0,
+    ) -> None:
+        # In multi-process mode this worker only hosts the room codes its shard owns.
+        self._shard = shard
+        self._recorder = recorder
+        self._resume_grace = resume_grace
+        # Hibernation: players come back through resume tokens, so it needs resuming on.
+        self._store = store if resume_grace > 0 else None
+        self._idle_s = idle_s
+        # Resident rooms before idle lobbies are evicted early; 0 for no cap.
+        self._max_resident = max_resident
+        self._sweeper: asyncio.Task[None] | None = None
+        self.sim_hz = sim_hz
+        self._dt = 1.0 / sim_hz
+        # Broadcast intervals in ticks: the configured rate, and the slowest adaptation may reach.
+        self._net_every = sim_hz / min(net_hz, sim_hz)
+        self._max_every = max(self._net_every, sim_hz / MIN_NET_HZ)
+        # Only guards the room-code registry; per-room work uses Room.lock.
+        self._registry_lock = asyncio.Lock()
         self._rooms: dict[str, Room] = {}
         self._ws_to_room: dict[int, str] = {}
+        self._scheduler = TickScheduler(sim_hz, self._step_room, self._publish_rooms)
+        # Handlers for joined connections by message `type`; hello and join are handled in handle_socket.
+        self._handlers: dict[str, Callable[[Room, int, dict[str, Any]], Awaitable[None]]] = {
+            "ready": self._handle_ready,
+            "input": self._handle_input,
+            "ping": self._handle_ping,
+            "quick_chat": self._handle_quick_chat,
+            "code_submit": self._handle_code_submit,
+        }
+
+    @property
+    def tick_stats(self) -> TickStats:
+        return self._scheduler.stats
+
+    @property
+    def room_count(self) -> int:
+        return len(self._rooms)
+
+    @property
+    def active_room_count(self) -> int:
+        return len(self._scheduler)
+
+    @property
+    def paused_room_count(self) -> int:
+        """Rooms holding a dropped player's seat (see _hold)."""
+        return sum(1 for room in self._rooms.values() if room.away)
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._ws_to_room)
+
+    def outbox_depths(self) -> list[int]:
+        """Frames waiting in each joined connection's outbox."""
+        return [len(conn.outbox) for room in self._rooms.values() for conn in room.conns.values()]
 
     async def handle_socket(self, ws: WebSocket) -> None:
         ws_id = id(ws)
         room: Room | None = None
         player_id: int | None = None
+        delta = False
+        binary = False
+        limiter = RateLimiter()
         try:
             while True:
-                msg = await ws.receive_json()
-                msg_type = msg.get("type")
+                frame = await ws.receive()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                data = frame.get("bytes")
+                text = frame.get("text")
+                # Charged before any decoding when the type is known up front; binary frames are inputs.
+                kind = "input" if data is not None else sniff_type(text)
+                if kind is not None and not limiter.allow(kind):
+                    if await self._rate_limited(ws, limiter, kind):
+                        break
+                    continue
+                if data is not None:
+                    msg = decode_input(data) if binary and len(data) <= MAX_MESSAGE_CHARS else None
+                    if msg is None:
+                        REJECTED_MESSAGES.labels("bad_frame").inc()
+                        error = {"type": "error", "code": "bad_frame", "message": "Unexpected binary frame."}
+                        await self._reply(ws, room, player_id, error)
+                        continue
+                else:
+                    try:
+                        msg = parse_message(text)
+                    except BadMessage as exc:
+                        REJECTED_MESSAGES.labels(exc.code).inc()
+                        if not limiter.allow(INVALID):
+                            if await self._rate_limited(ws, limiter, INVALID):
+                                break
+                            continue
+                        await self._reply(ws, room, player_id, {"type": "error", "code": exc.code, "message": str(exc)})
+                        continue
+                msg_type = msg["type"]
+                if msg_type != kind and not limiter.allow(msg_type):
+                    if await self._rate_limited(ws, limiter, msg_type):
+                        break
+                    continue
 
                 if msg_type == "hello":
-                    await ws.send_json({"type": "welcome", "version": 1})
+                    delta = msg.get("delta", False)
+                    binary = msg.get("version") == BINARY_VERSION
+                    version = BINARY_VERSION if binary else 1
+                    welcome = {"type": "welcome", "version": version, "delta": delta, "tick_hz": self.sim_hz}
+                    await self._reply(ws, room, player_id, welcome)
                     continue
 
                 if msg_type == "join":
-                    room, player_id = await self._handle_join(ws, msg)
+                    started = time.perf_counter()
+                    room, player_id = await self._handle_join(ws, msg, delta, binary)
+                    JOIN_SECONDS.observe(time.perf_counter() - started)
                     continue
 
                 if room is None or player_id is None or player_id < 0:
                     await ws.send_json({"type": "error", "code": "not_joined", "message": "Send join first."})
                     continue
+                conn = room.conns.get(player_id)
+                if conn is None or conn.ws is not ws:
+                    # The seat was resumed from another socket.
+                    break
 
-                if msg_type == "ready":
-                    await self._handle_ready(room, player_id, bool(msg.get("ready")))
-                elif msg_type == "input":
-                    await self._handle_input(room, player_id, msg)
-                elif msg_type == "ping":
-                    await self._handle_ping(room, player_id, msg)
-                elif msg_type == "quick_chat":
-                    await self._handle_quick_chat(room, player_id, msg)
-                elif msg_type == "code_submit":
-                    await self._handle_code_submit(room, player_id, msg)
-                else:
-                    await ws.send_json({"type": "error", "code": "bad_type", "message": f"Unknown type: {msg_type}"})
+                await self._handlers[msg_type](room, player_id, msg)
         except Exception:
             pass
         finally:
             await self._disconnect(ws_id, ws)
 
+    async def _rate_limited(self, ws: WebSocket, limiter: RateLimiter, kind: str) -> bool:
+        """Count a frame dropped over its limit; True if that was one strike too many and ws is closed."""
+        RATE_LIMITED.labels(kind).inc()
+        if not limiter.strike():
+            return False
+        RATE_LIMIT_DISCONNECTS.inc()
+        # The seat is held for a resume as on any other drop.
+        await self._disconnect(id(ws), ws)
+        try:
+            await ws.close(code=RATE_LIMITED_CLOSE)
+        except Exception:
+            pass
+        return True
+
+    async def _reply(self, ws: WebSocket, room: Room | None, player_id: int | None, msg: dict[str, Any]) -> None:
+        # Once joined, the connection's writer task owns the socket; before that we send directly.
+        conn = room.conns.get(player_id) if room is not None and player_id is not None else None
+        if conn is not None and conn.ws is ws:
+            conn.outbox.put_event(dumps(msg))
+        else:
+            await ws.send_json(msg)
+
     async def _disconnect(self, ws_id: int, ws: WebSocket) -> None:
-        async with self._lock:
-            room_code = self._ws_to_room.pop(ws_id, None)
-            if not room_code:
+        room_code = self._ws_to_room.pop(ws_id, None)
+        if not room_code:
+            return
+        room = self._rooms.get(room_code)
+        if not room:
+            return
+
+        async with room.lock:
+            player_id = next((pid for pid, conn in room.conns.items() if conn.ws is ws), None)
+            if player_id is None:
                 return
-            room = self._rooms.get(room_code)
-            if not room:
+            room.conns.pop(player_id).outbox.close()
+            if self._resume_grace > 0 and player_id in room.players:
+                self._hold(room, player_id)
                 return
-            for pid, conn in list(room.conns.items()):
-                if conn.ws is ws:
-                    room.conns.pop(pid, None)
-                    room.players.pop(pid, None)
-            room.messages.append({"t": room.tick, "kind": "system", "text": "A player disconnected."})
-            if not room.conns:
-                if room.task:
-                    room.task.cancel()
-                self._rooms.pop(room_code, None)
+            closed = self._unseat(room, player_id)
+
+        if closed:
+            await self._unregister(room)
+
+    def _hold(self, room: Room, player_id: int) -> None:
+        """Keep a dropped player's seat and state for a resume; the room pauses, nothing is rebuilt."""
+        room.away[player_id] = asyncio.create_task(self._expire_hold(room, player_id))
+        if room.record:
+            room.record.away(room.tick, player_id)
+        self._scheduler.discard(room)
+        room.add_message({"t": room.tick, "kind": "system", "text": f"Player {player_id} lost connection, waiting."})
+
+    async def _expire_hold(self, room: Room, player_id: int) -> None:
+        await asyncio.sleep(self._resume_grace)
+        await self._release(room, player_id)
+
+    async def _release(self, room: Room, player_id: int) -> None:
+        """Give up a held seat: the player leaves for good and the room drops back to the lobby."""
+        async with room.lock:
+            task = room.away.pop(player_id, None)
+            if task is None:
                 return
-            room.started = False
-            for ps in room.players.values():
-                ps.ready = False
+            if task is not asyncio.current_task():
+                task.cancel()
+            closed = self._unseat(room, player_id)
+        if closed:
+            await self._unregister(room)
+
+    def _unseat(self, room: Room, player_id: int) -> bool:
+        """Remove a player from the roster (caller holds room.lock); True if that closed the room."""
+        room.players.pop(player_id, None)
+        if room.record:
+            room.record.leave(room.tick, player_id)
+        room.epoch += 1
+        room.add_message({"t": room.tick, "kind": "system", "text": "A player disconnected."})
+        room.started = False
+        room.last_active = time.monotonic()
+        self._scheduler.discard(room)
+        if not room.conns and not room.away:
+            room.closed = True
+            if room.record:
+                room.record.close(room.tick)
+        for ps in room.players.values():
+            ps.ready = False
+        return room.closed
+
+    async def _unregister(self, room: Room) -> None:
+        async with self._registry_lock:
+            if self._rooms.get(room.code) is room:
+                self._rooms.pop(room.code, None)
+
+    # --- hibernation
+
+    async def _sweep(self) -> None:
+        """Runs while any room is resident: hibernates idle lobbies, prunes the store now and then."""
+        sweeps = 0
+        while self._rooms:
+            await asyncio.sleep(HIBERNATE_SWEEP_S)
+            await self._evict_idle(time.monotonic())
+            sweeps += 1
+            if sweeps % HIBERNATE_PRUNE_EVERY == 0:
+                self._store.prune()
+
+    def _can_hibernate(self, room: Room, now: float, min_idle: float) -> bool:
+        # Running or paused rooms stay; so do seats being held for a resume, which expire on their own.
+        return (
+            not room.started
+            and not room.away
+            and not room.closed
+            and now - room.last_active >= min_idle
+            and storable(room.code)
+        )
 
-    async def _handle_join(self, ws: WebSocket, msg: dict[str, Any]) -> tuple[Room, int]:
-        async with self._lock:
-            desired_code = (msg.get("room_code") or "").strip().upper()
-            name = (msg.get("player_name") or "").strip()[:16]
+    async def _evict_idle(self, now: float) -> None:
+        """Hibernate lobbies idle past `idle_s`; over the resident budget, least recently active first."""
+        # The floor only holds back budget evictions; an idle_s below it still applies as configured.
+        min_idle = min(self._idle_s, HIBERNATE_MIN_IDLE_S)
+        idle = sorted(
+            (room for room in self._rooms.values() if self._can_hibernate(room, now, min_idle)),
+            key=lambda room: room.last_active,
+        )
+        over = len(self._rooms) - self._max_resident if self._max_resident else 0
+        for n, room in enumerate(idle):
+            if n >= over and now - room.last_active < self._idle_s:
+                break
+            await self._hibernate(room)
+
+    async def _hibernate(self, room: Room) -> bool:
+        """Write the room to the store and drop it; its players resume it later with their tokens."""
+        # Registry before room lock (the only place both are held), so no join can seat a player
+        # between the snapshot and the room leaving the registry.
+        async with self._registry_lock:
+            async with room.lock:
+                if self._rooms.get(room.code) is not room or room.started or room.away:
+                    return False
+                try:
+                    self._store.save(room.code, self._snapshot_room(room))
+                except OSError:
+                    return False
+                room.closed = True
+                self._rooms.pop(room.code)
+                stale = list(room.conns.values())
+                room.conns.clear()
+                for conn in stale:
+                    conn.outbox.close()
+                    self._ws_to_room.pop(id(conn.ws), None)
+                if room.record:
+                    room.record.hibernated(room.tick)
+        ROOMS_HIBERNATED.inc()
+        for conn in stale:
+            try:
+                await conn.ws.close(code=HIBERNATED_CLOSE)
+            except Exception:
+                pass
+        return True
+
+    def _snapshot_room(self, room: Room) -> dict[str, Any]:
+        # Lobbies only (see _can_hibernate): no inputs in flight, nothing scheduled.
+        return {
+            "code": room.code,
+            "created_at": room.created_at,
+            "rng_seed": room.rng_seed,
+            "escape_code": room.escape_code,
+            "code_fragments": room.code_fragments,
+            "room_index": room.room_index,
+            "tick": room.tick,
+            "time": room.time,
+            "epoch": room.epoch,
+            "next_msg_id": room.next_msg_id,
+            "messages": list(room.messages),
+            "players": [asdict(ps) for ps in room.players.values()],
+            "runtime": save_room_runtime(room.room_runtime),
+        }
 
+    def _restore_room(self, snapshot: dict[str, Any]) -> Room:
+        room_index = snapshot["room_index"]
+        fragments = snapshot["code_fragments"]
+        room_static, room_runtime = build_room(room_index, fragments[room_index])
+        restore_room_runtime(room_runtime, snapshot["runtime"])
+        room = Room(
+            code=snapshot["code"],
+            created_at=snapshot["created_at"],
+            rng_seed=snapshot["rng_seed"],
+            escape_code=snapshot["escape_code"],
+            code_fragments=fragments,
+            room_index=room_index,
+            tick=snapshot["tick"],
+            time=snapshot["time"],
+            # Nobody may delta against a baseline from before the room slept.
+            epoch=snapshot["epoch"] + 1,
+            next_msg_id=snapshot["next_msg_id"],
+            room_static=room_static,
+            room_runtime=room_runtime,
+        )
+        room.messages.extend(snapshot["messages"])
+        for saved in snapshot["players"]:
+            ps = PlayerState(**saved)
+            room.players[ps.player_id] = ps
+            # Every seat comes back held; its owner takes it with the same resume token.
+            room.away[ps.player_id] = asyncio.create_task(self._expire_hold(room, ps.player_id))
+        if self._recorder is not None:
+            room.record = self._recorder.open(room, reopened=True)
+        ROOMS_RESTORED.inc()
+        return room
+
+    async def _get_or_create_room(self, desired_code: str, token: Any = "") -> Room | None:
+        """The room for `desired_code` (or a new code), restoring it from the store if it hibernated.
+
+        None if the code is a hibernated room this join could not get a seat in: it stays stored, so
+        a stranger's join neither starts its seats' grace timers nor costs its players the saved run.
+        """
+        async with self._registry_lock:
             if desired_code:
                 room = self._rooms.get(desired_code)
                 if room is None:
-                    room = self._create_room(desired_code)
-                    self._rooms[desired_code] = room
-            else:
-                while True:
-                    code = _gen_room_code()
-                    if code not in self._rooms:
-                        room = self._create_room(code)
-                        self._rooms[code] = room
-                        break
+                    snapshot = self._store.load(desired_code) if self._store is not None else None
+                    if snapshot is None:
+                        room = self._create_room(desired_code)
+                    elif not self._may_restore(snapshot, token):
+                        return None
+                    else:
+                        room = self._restore_room(snapshot)
+                        self._store.discard(desired_code)
+                    self._register(room)
+                return room
+            while True:
+                code = _gen_room_code()
+                if self._shard and not self._shard.owns(code):
+                    continue
+                if code not in self._rooms and (self._store is None or code not in self._store):
+                    room = self._create_room(code)
+                    self._register(room)
+                    return room
+
+    def _may_restore(self, snapshot: dict[str, Any], token: Any) -> bool:
+        """Whether a join with `token` gets a seat in a hibernated room: a free one or its own held one."""
+        players = snapshot["players"]
+        if len(players) < 2:
+            return True
+        if not token or not isinstance(token, str):
+            return False
+        return any(ps["resume_token"] and secrets.compare_digest(ps["resume_token"], token) for ps in players)
+
+    def _register(self, room: Room) -> None:
+        self._rooms[room.code] = room
+        if self._store is not None and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _handle_join(
+        self, ws: WebSocket, msg: dict[str, Any], delta: bool = False, binary: bool = False
+    ) -> tuple[Room | None, int]:
+        desired_code = (msg.get("room_code") or "").strip().upper()
+        name = (msg.get("player_name") or "").strip()[:16]
+        token = msg.get("resume_token") or ""
+        stale: PlayerConn | None = None
+
+        if desired_code and self._shard and not self._shard.owns(desired_code):
+            await ws.send_json({"type": "error", "code": "wrong_worker", "message": "Room is hosted elsewhere."})
+            return None, -1
 
-            if len(room.conns) >= 2:
+        while True:
+            room = await self._get_or_create_room(desired_code, token)
+            if room is None:
                 await ws.send_json({"type": "error", "code": "room_full", "message": "Room is full."})
-                return room, -1
-
-            player_id = 1 if 1 not in room.conns else 2
-            role = "guardian" if player_id == 1 else "scholar"
-            room.conns[player_id] = PlayerConn(ws=ws, player_id=player_id, role=role, name=name)
-
-            spawn = self._spawn_for(room.room_index, role)
-            room.players[player_id] = PlayerState(player_id=player_id, role=role, x=spawn[0], y=spawn[1])
-            self._ws_to_room[id(ws)] = room.code
-
-            if room.task is None or room.task.done():
-                room.task = asyncio.create_task(self._room_loop(room))
-
-            players_payload = [
-                {"player_id": ps.player_id, "role": ps.role, "ready": ps.ready} for ps in room.players.values()
-            ]
-            await ws.send_json(
-                {"type": "joined", "room_code": room.code, "player_id": player_id, "role": role, "players": players_payload}
-            )
-            room.broadcast({"type": "event", "name": "roster", "data": {"players": players_payload}})
-            room.messages.append({"t": room.tick, "kind": "system", "text": "A player joined."})
-            return room, player_id
+                return None, -1
+            async with room.lock:
+                if room.closed:
+                    # Emptied and unregistered while we waited; look the code up again.
+                    continue
+                ps = self._held_seat(room, token) if token else None
+                resumed = ps is not None
+                if resumed:
+                    player_id = ps.player_id
+                    role = ps.role
+                    stale = self._resume(room, player_id)
+                elif len(room.players) >= 2:
+                    # Held seats count: a dropped player's place is not up for grabs.
+                    player_id = -1
+                    break
+                else:
+                    player_id = 1 if 1 not in room.players else 2
+                    role = "guardian" if player_id == 1 else "scholar"
+                room.conns[player_id] = PlayerConn(
+                    ws=ws,
+                    player_id=player_id,
+                    role=role,
+                    name=name,
+                    delta=delta,
+                    binary=binary,
+                    send_every=self._net_every,
+                )
+                conn = room.conns[player_id]
+
+                if not resumed:
+                    spawn = self._spawn_for(room.room_index, role)
+                    ps = PlayerState(player_id=player_id, role=role, x=spawn[0], y=spawn[1])
+                    room.players[player_id] = ps
+                    if room.record:
+                        room.record.join(room.tick, player_id, role)
+                    room.add_message({"t": room.tick, "kind": "system", "text": "A player joined."})
+                else:
+                    if room.record:
+                        room.record.resumed(room.tick, player_id)
+                    room.add_message({"t": room.tick, "kind": "system", "text": f"Player {player_id} reconnected."})
+                    if room.started and not room.away and len(room.conns) == 2:
+                        self._scheduler.add(room)
+                # Bumped on a resume too, so no connection deltas against a pre-drop baseline.
+                room.epoch += 1
+                room.last_active = time.monotonic()
+                ps.resume_token = secrets.token_urlsafe(16) if self._resume_grace > 0 else ""
+                resume_token = ps.resume_token
+                self._ws_to_room[id(ws)] = room.code
+                players_payload = [
+                    {"player_id": ps.player_id, "role": ps.role, "ready": ps.ready} for ps in room.players.values()
+                ]
+                break
+
+        # Sends happen outside every lock so a slow client cannot stall other joins.
+        if player_id < 0:
+            await ws.send_json({"type": "error", "code": "room_full", "message": "Room is full."})
+            return room, -1
+
+        if stale is not None:
+            try:
+                await stale.ws.close(code=RESUMED_ELSEWHERE_CLOSE)
+            except Exception:
+                pass
+
+        conn.outbox.start()
+        joined = {
+            "type": "joined",
+            "room_code": room.code,
+            "player_id": player_id,
+            "role": role,
+            "players": players_payload,
+        }
+        if resume_token:
+            joined.update(resume_token=resume_token, resume_s=self._resume_grace, resumed=resumed)
+        conn.outbox.put_event(dumps(joined))
+        room.broadcast({"type": "event", "name": "roster", "data": {"players": players_payload}})
+        return room, player_id
+
+    def _held_seat(self, room: Room, token: Any) -> PlayerState | None:
+        if not isinstance(token, str):
+            return None
+        for ps in room.players.values():
+            if ps.resume_token and secrets.compare_digest(ps.resume_token, token):
+                return ps
+        return None
+
+    def _resume(self, room: Room, player_id: int) -> PlayerConn | None:
+        """Free a held seat for its owner (caller holds room.lock).
+
+        Returns the connection still sitting in the seat, if the old socket has
+        not noticed it dropped yet; the caller closes it once out of the lock.
+        """
+        task = room.away.pop(player_id, None)
+        if task is not None:
+            task.cancel()
+        stale = room.conns.pop(player_id, None)
+        if stale is not None:
+            stale.outbox.close()
+            self._ws_to_room.pop(id(stale.ws), None)
+        return stale
 
     def _create_room(self, code: str) -> Room:
         seed = sum(ord(c) for c in code) * 1337
@@ -195,7 +708,7 @@ class GameServer:
         for i, f in enumerate(fragments):
             f["hint"] = hint_orders[i]
         room_static, room_runtime = build_room(0, fragments[0])
-        return Room(
+        room = Room(
             code=code,
             created_at=time.time(),
             rng_seed=seed,
@@ -204,97 +717,172 @@ class GameServer:
             room_static=room_static,
             room_runtime=room_runtime,
         )
+        if self._recorder is not None:
+            room.record = self._recorder.open(room)
+        return room
 
     def _spawn_for(self, room_index: int, role: str) -> tuple[float, float]:
-        base_x = 90.0
-        base_y = 130.0 if role == "guardian" else 210.0
-        return base_x, base_y
+        return ROOM_DEFS[room_index].spawns[role]
 
-    async def _handle_ready(self, room: Room, player_id: int, ready: bool) -> None:
+    async def _handle_ready(self, room: Room, player_id: int, msg: dict[str, Any]) -> None:
         ps = room.players.get(player_id)
         if not ps:
             return
+        ready = msg["ready"]
+        room.last_active = time.monotonic()
+        if room.record:
+            room.record.ready(room.tick, player_id, ready)
         ps.ready = ready
-        if len(room.players) == 2 and all(p.ready for p in room.players.values()):
+        if len(room.conns) == 2 and not room.away and all(p.ready for p in room.players.values()):
             room.started = True
             reset_room_runtime_state(room)
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Game started."})
+            self._scheduler.add(room)
+            room.add_message({"t": room.tick, "kind": "system", "text": "Game started."})
 
     async def _handle_input(self, room: Room, player_id: int, msg: dict[str, Any]) -> None:
         conn = room.conns.get(player_id)
         if not conn:
             return
-        try:
-            seq = int(msg.get("seq", 0))
-        except Exception:
-            seq = 0
-        conn.last_seq = max(conn.last_seq, seq)
-        mx = float(msg.get("move_x", 0.0))
-        my = float(msg.get("move_y", 0.0))
-        mx, my = normalize(mx, my)
-        conn.move_x, conn.move_y = mx, my
-        conn.interact_held = bool(msg.get("interact", False))
+        conn.ack_tick = msg.get("ack", -1)
+        conn.msg_ack = min(max(conn.msg_ack, msg.get("msg_ack", 0)), room.next_msg_id - 1)
+        sent = conn.sent_at.get(conn.ack_tick)
+        if sent is not None:
+            sample = time.perf_counter() - sent
+            conn.rtt = sample if conn.rtt is None else conn.rtt + (sample - conn.rtt) * 0.125
+            for t in [t for t in conn.sent_at if t <= conn.ack_tick]:
+                del conn.sent_at[t]
+
+        # `inputs` repeats the last few inputs (newest last) so one lost frame costs nothing;
+        # without it the frame carries a single input in its top-level fields.
+        # Shapes and types are checked by schema.parse_message (recordings store interact as 0/1).
+        entries = msg.get("inputs")
+        if entries is None:
+            entries = [(msg["seq"], msg["move_x"], msg["move_y"], msg.get("interact", False))]
+        parsed = sorted(
+            (seq, float(mx), float(my), bool(interact)) for seq, mx, my, interact in entries[-MAX_REDUNDANT_INPUTS:]
+        )
+        accepted = []
+        active = False
+        for seq, mx, my, interact in parsed:
+            if seq <= conn.last_seq:
+                continue
+            conn.last_seq = seq
+            conn.inputs.append((seq, mx, my, interact))
+            accepted.append((seq, mx, my, interact))
+            active = active or bool(mx or my or interact)
+        if active:
+            # Clients send inputs every 50 ms even when idle; only real ones keep a lobby awake.
+            room.last_active = time.monotonic()
+        if accepted and room.record:
+            room.record.inputs(room.tick, player_id, accepted)
 
     async def _handle_ping(self, room: Room, player_id: int, msg: dict[str, Any]) -> None:
-        room.messages.append(
+        room.last_active = time.monotonic()
+        room.add_message(
             {
                 "t": room.tick,
                 "kind": "ping",
-                "x": float(msg.get("x", 0.0)),
-                "y": float(msg.get("y", 0.0)),
+                "x": float(msg["x"]),
+                "y": float(msg["y"]),
                 "text": (msg.get("label") or "PING")[:12],
             }
         )
 
     async def _handle_quick_chat(self, room: Room, player_id: int, msg: dict[str, Any]) -> None:
-        preset_id = (msg.get("preset_id") or "")[:32]
-        room.messages.append({"t": room.tick, "kind": "chat", "player_id": player_id, "text": preset_id})
+        preset_id = msg["preset_id"][:32]
+        room.last_active = time.monotonic()
+        room.add_message({"t": room.tick, "kind": "chat", "player_id": player_id, "text": preset_id})
 
     async def _handle_code_submit(self, room: Room, player_id: int, msg: dict[str, Any]) -> None:
-        code = (msg.get("code") or "").strip().upper()[:20]
+        code = msg["code"].strip().upper()[:20]
+        room.last_active = time.monotonic()
+        if room.record:
+            room.record.code_submit(room.tick, player_id, code)
         if room.room_index != (ROOM_COUNT - 1):
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Not at the final gate yet."})
+            room.add_message({"t": room.tick, "kind": "system", "text": "Not at the final gate yet."})
             return
 
         puzzle = room.room_runtime.get("puzzle", {})
         if not puzzle.get("plates_ok"):
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Both plates must be held."})
+            room.add_message({"t": room.tick, "kind": "system", "text": "Both plates must be held."})
             return
         if not puzzle.get("panel_active"):
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Interact with the panel first."})
+            room.add_message({"t": room.tick, "kind": "system", "text": "Interact with the panel first."})
             return
 
         ok = code == room.escape_code
         if ok:
             room.room_runtime["final_unlocked"] = True
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Final code accepted!"})
+            room.add_message({"t": room.tick, "kind": "system", "text": "Final code accepted!"})
         else:
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Wrong code."})
-
-    async def _room_loop(self, room: Room) -> None:
-        next_time = time.perf_counter()
-        while True:
-            next_time += DT
-            room.tick += 1
-            if room.started:
-                self._simulate(room, DT)
-                await self._broadcast_state(room)
-            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+            room.add_message({"t": room.tick, "kind": "system", "text": "Wrong code."})
+
+    def _step_room(self, room: Room) -> None:
+        room.tick += 1
+        room.time = room.tick / self.sim_hz
+        for conn in room.conns.values():
+            # Inputs are paced by the client's input period, not the tick rate: each one moves its
+            # player for exactly input_dt, as the client predicts, and time short of a whole input
+            # carries over to later ticks.
+            conn.input_clock += self._dt
+            due = 0
+            while conn.input_clock >= MOVEMENT.input_dt - 1e-9:
+                conn.input_clock -= MOVEMENT.input_dt
+                due += 1
+            self._drain_input(conn, due)
+        started = time.perf_counter()
+        self._simulate(room, self._dt)
+        _SIMULATE_SECONDS[room.room_index].observe(time.perf_counter() - started)
+        if room.record:
+            room.record.stepped(room)
+
+    def _drain_input(self, conn: PlayerConn, count: int = 1) -> None:
+        """Take this tick's `count` inputs from the buffer into conn.moves; past the queue the last one stays held."""
+        conn.moves.clear()
+        if not count:
+            return
+        queue = conn.inputs
+        taken = bool(queue)
+        interact = False
+        # A backlog is folded away unmoved, so latency can't build up.
+        for _ in range(min(max(len(queue) - INPUT_BACKLOG - count + 1, 0), len(queue) - 1)):
+            # Folded inputs still count as a press so short taps aren't lost.
+            interact = queue.popleft()[3] or interact
+        for _ in range(count):
+            if queue:
+                seq, mx, my, held = queue.popleft()
+                conn.processed_seq = seq
+                conn.move_x, conn.move_y = normalize(mx, my)
+                interact = held or interact
+            conn.moves.append((conn.move_x, conn.move_y))
+        if taken:
+            conn.interact_held = interact
+
+    async def _publish_rooms(self, rooms: list[Room]) -> None:
+        results = await asyncio.gather(*(self._broadcast_state(room) for room in rooms), return_exceptions=True)
+        for room, result in zip(rooms, results):
+            if isinstance(result, Exception):
+                self._scheduler.fail(room, result)
 
     def _simulate(self, room: Room, dt: float) -> None:
         # movement
+        # Mirrored by the client's prediction; both read shared/movement.json.
         door_open = bool(room.room_runtime.get("door_open", False))
+        bounds = MOVEMENT.bounds
+        step = MOVEMENT.input_dt
         for pid, ps in list(room.players.items()):
             conn = room.conns.get(pid)
             if not conn or ps.down:
                 continue
-            speed = 135.0 if ps.role == "guardian" else 165.0
-            ps.x += conn.move_x * speed * dt
-            ps.y += conn.move_y * speed * dt
-            ps.x = clamp(ps.x, 20.0, 940.0)
-            ps.y = clamp(ps.y, 20.0, 520.0)
-            if not door_open:
-                ps.x = min(ps.x, 871.0)
+            speed = MOVEMENT.speed[ps.role]
+            # Step by step like the client's stepMovement, so a replay of the same inputs lands on the same spot.
+            for mx, my in conn.moves:
+                ps.x += mx * speed * step
+                ps.y += my * speed * step
+                ps.x = clamp(ps.x, bounds.x, bounds.x + bounds.w)
+                ps.y = clamp(ps.y, bounds.y, bounds.y + bounds.h)
+                if not door_open:
+                    ps.x = min(ps.x, MOVEMENT.door_closed_max_x)
 
         room_tick(room, dt)
 
@@ -312,15 +900,11 @@ class GameServer:
 
         if room.players and all(p.down for p in room.players.values()):
             reset_room_runtime_state(room)
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Room reset."})
-
-        exit_zone = room.room_static.get("exit_zone")
-        if exit_zone and room.room_runtime.get("door_open"):
-            if all(
-                exit_zone["x"] <= ps.x <= exit_zone["x"] + exit_zone["w"]
-                and exit_zone["y"] <= ps.y <= exit_zone["y"] + exit_zone["h"]
-                for ps in room.players.values()
-            ):
+            room.add_message({"t": room.tick, "kind": "system", "text": "Room reset."})
+
+        exit_zone = room.room_static.exit_zone
+        if room.room_runtime.get("door_open"):
+            if all(exit_zone.contains(ps.x, ps.y) for ps in room.players.values()):
                 self._advance_room(room)
 
     def _maybe_award_fragment(self, room: Room) -> None:
@@ -343,7 +927,7 @@ class GameServer:
 
         room.room_runtime["fragment_awarded"] = True
         frag = room.code_fragments[room.room_index]
-        room.messages.append(
+        room.add_message(
             {"t": room.tick, "kind": "system", "text": f"Code fragment found: {frag['frag']} (hint {frag['hint']})"}
         )
 
@@ -369,7 +953,7 @@ class GameServer:
                 down.down = False
                 down.hp = 20
                 down.revive_progress = 0.0
-                room.messages.append({"t": room.tick, "kind": "system", "text": f"Player {down.player_id} revived."})
+                room.add_message({"t": room.tick, "kind": "system", "text": f"Player {down.player_id} revived."})
 
     def _advance_room(self, room: Room) -> None:
         if room.room_index >= ROOM_COUNT - 1:
@@ -378,6 +962,7 @@ class GameServer:
         room.room_index += 1
         frag = room.code_fragments[room.room_index]
         room.room_static, room.room_runtime = build_room(room.room_index, frag)
+        room.epoch += 1
         for ps in room.players.values():
             ps.x, ps.y = self._spawn_for(room.room_index, ps.role)
             ps.hp = 30
@@ -386,36 +971,99 @@ class GameServer:
             ps.damage_cd.clear()
 
     async def _broadcast_state(self, room: Room) -> None:
-        room.messages = room.messages[-25:]
-
-        players = [
-            {
+        conns = room.conns
+        due = [conn for conn in conns.values() if room.tick >= conn.next_send_tick]
+        if not due:
+            return
+        players = {
+            ps.player_id: {
                 "player_id": ps.player_id,
                 "role": ps.role,
-                "x": ps.x,
-                "y": ps.y,
+                "x": round(ps.x, 1),
+                "y": round(ps.y, 1),
                 "hp": ps.hp,
                 "down": ps.down,
-                "revive_progress": ps.revive_progress,
+                "revive_progress": round(ps.revive_progress, 2),
                 "ready": ps.ready,
+                # Last input applied for this player; the owner replays anything newer.
+                "seq": conns[ps.player_id].processed_seq if ps.player_id in conns else -1,
             }
             for ps in room.players.values()
-        ]
-
-        base = {
-            "type": "state",
-            "tick": room.tick,
-            "room_index": room.room_index,
-            "players": players,
-            "entities": room.room_runtime.get("entities", []),
-            "messages": room.messages,
         }
 
-        for pid, conn in list(room.conns.items()):
+        # Entity.wire() hands out a cached dict that is replaced (never mutated) on
+        # change, so snapshots can hold references without copying.
+        snap = Snapshot(
+            tick=room.tick,
+            epoch=room.epoch,
+            room_index=room.room_index,
+            players=players,
+            entities=[e.wire() for e in room.room_runtime.get("entities", [])],
+        )
+        room.history.add(snap)
+
+        # The shared body is encoded once per baseline and wire format (usually one
+        # keyframe or one delta per tick); the per-role ui and the per-connection
+        # unacked messages are encoded separately and spliced in.
+        payloads: dict[int, dict[str, Any]] = {}
+        bodies: dict[tuple[int, bool], Any] = {}
+        pending: dict[int, str] = {}
+        for conn in due:
             ui = self._build_ui_for(room, conn.role)
-            msg = dict(base)
-            msg["ui"] = ui
-            await _safe_send(conn.ws, msg)
+            snap.ui[conn.role] = ui
+            base = room.history.get(conn.ack_tick) if conn.delta else None
+            if base is not None and base.epoch == snap.epoch:
+                key = base.tick
+                send_ui = ui != base.ui.get(conn.role)
+            else:
+                base = None
+                key = KEYFRAME
+                send_ui = True
+
+            body = bodies.get((key, conn.binary))
+            if body is None:
+                payload = payloads.get(key)
+                if payload is None:
+                    payload = keyframe_payload(snap) if base is None else delta_payload(base, snap)
+                    payloads[key] = payload
+                if conn.binary:
+                    body = encode_state(snap, None if base is None else payload)
+                else:
+                    body = dumps(payload)[:-1]
+                bodies[(key, conn.binary)] = body
+
+            fields = []
+            if send_ui:
+                fields.append(encode_field("ui", ui))
+            if conn.msg_ack < room.next_msg_id - 1:
+                msgs = pending.get(conn.msg_ack)
+                if msgs is None:
+                    msgs = pending[conn.msg_ack] = encode_field("messages", room.messages_after(conn.msg_ack))
+                fields.append(msgs)
+            if conn.binary:
+                tail = ("{" + ",".join(fields) + "}").encode("utf-8")
+                frame = body + encode_tail(tail)
+            else:
+                frame = splice(body, *fields)
+            STATE_FRAME_BYTES.labels(
+                "binary" if conn.binary else "json", "keyframe" if key == KEYFRAME else "delta"
+            ).observe(len(frame))
+            conflated = conn.outbox.put_state(frame)
+            conn.sent_at[room.tick] = time.perf_counter()
+            if len(conn.sent_at) > SENT_TRACK:
+                del conn.sent_at[next(iter(conn.sent_at))]
+            self._adapt_send_rate(conn, conflated or conn.outbox.last_send_time > BACKPRESSURE_S)
+            conn.next_send_tick = room.tick + max(1, round(conn.send_every))
+
+    def _adapt_send_rate(self, conn: PlayerConn, backlogged: bool) -> None:
+        """Back off fast while the socket pushes back, otherwise ease toward the RTT-scaled rate."""
+        if backlogged:
+            conn.send_every = min(conn.send_every * 1.5, self._max_every)
+            return
+        target = self._net_every
+        if conn.rtt is not None and conn.rtt > RTT_TARGET:
+            target = min(target * conn.rtt / RTT_TARGET, self._max_every)
+        conn.send_every += (target - conn.send_every) * 0.25
 
     def _build_ui_for(self, room: Room, role: str) -> dict[str, Any]:
         # Hide fragment text until awarded to preserve the "code shards" feel.
@@ -435,19 +1083,20 @@ class GameServer:
         }
 
         # Role-specific puzzle hints (only after the scholar reads signs).
-        if room.room_index == 1:
+        kind = room.room_static.kind
+        if kind == "levers":
             pz = room.room_runtime.get("puzzle", {})
             if role == "scholar" and pz.get("mural_read"):
                 target = pz.get("target", [])
                 map_state = {0: "L", 1: "M", 2: "R"}
                 ui["private_hint"] = "Levers target: " + "-".join(map_state.get(int(v), "?") for v in target)
-        if room.room_index == 3:
+        if kind == "valves":
             pz = room.room_runtime.get("puzzle", {})
             if role == "scholar" and pz.get("order_revealed"):
                 order = pz.get("order", [])
                 ui["private_hint"] = "Valves order: " + "-".join(v.replace("v", "") for v in order)
 
-        if room.room_index == 4:
+        if kind == "final_panel":
             pz = room.room_runtime.get("puzzle", {})
             ui["can_submit"] = bool(pz.get("plates_ok")) and bool(pz.get("panel_active"))
 
@@ -0,0 +1,90 @@
+"""On-disk store for hibernated rooms.
+
+GameServer snapshots a lobby that has sat idle (or the least recently active
+ones, past its resident-room budget) into a plain dict, closes its sockets and
+drops it from memory; a resume for that code, or a join that would get a
+free seat, loads it back. Any other join leaves it stored for its players.
+Each room is one gzip'd JSON file named after its code. Entries older than
+`ttl_s` are treated as gone and pruned.
+
+Only codes made of ASCII letters and digits are stored, since clients pick
+room codes and the code becomes a file name.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from .codec import dumps, loads
+
+
+FORMAT_VERSION = 1
+SUFFIX = ".json.gz"
+
+
+def storable(code: str) -> bool:
+    return code.isascii() and code.isalnum()
+
+
+class RoomStore:
+    def __init__(self, directory: Path, ttl_s: float) -> None:
+        self.directory = directory
+        self.ttl_s = ttl_s
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, code: str) -> Path:
+        return self.directory / f"{code}{SUFFIX}"
+
+    def __contains__(self, code: str) -> bool:
+        if not storable(code):
+            return False
+        try:
+            return time.time() - self._path(code).stat().st_mtime < self.ttl_s
+        except OSError:
+            return False
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.directory.glob(f"*{SUFFIX}"))
+
+    def save(self, code: str, snapshot: dict[str, Any]) -> int:
+        """Write a snapshot (replacing any older one); returns its size on disk."""
+        blob = gzip.compress(dumps({"v": FORMAT_VERSION, **snapshot}).encode("utf-8"), compresslevel=6)
+        path = self._path(code)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+        return len(blob)
+
+    def load(self, code: str) -> dict[str, Any] | None:
+        """Read a snapshot, leaving it stored until `discard`; None (and an unusable entry deleted) if none."""
+        if code not in self:
+            return None
+        path = self._path(code)
+        try:
+            snapshot = loads(gzip.decompress(path.read_bytes()))
+        except (OSError, ValueError, EOFError):
+            snapshot = None
+        if not isinstance(snapshot, dict) or snapshot.pop("v", None) != FORMAT_VERSION:
+            path.unlink(missing_ok=True)
+            return None
+        return snapshot
+
+    def discard(self, code: str) -> None:
+        self._path(code).unlink(missing_ok=True)
+
+    def prune(self) -> int:
+        """Delete expired entries; returns how many went."""
+        cutoff = time.time() - self.ttl_s
+        removed = 0
+        for path in self.directory.glob(f"*{SUFFIX}"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
@@ -0,0 +1,191 @@
+"""In-process metrics rendered in the Prometheus text format at `/metrics`.
+
+Recording is a float add or a bucket increment on the hot path; nothing is
+formatted until a scrape. Values that already live elsewhere (room counts,
+queue depths, TickStats) are registered as callbacks and only read at scrape
+time, so they cost nothing between scrapes.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Callable, Iterable, Mapping
+
+
+LabelValues = tuple[str, ...]
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # One slot per upper bound plus +Inf; made cumulative when rendered.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Family:
+    """A metric name with one child per label-value combination."""
+
+    def __init__(self, name: str, help: str, kind: str, labels: tuple[str, ...], make: Callable[[], object]) -> None:
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labels
+        self._make = make
+        self.children: dict[LabelValues, object] = {}
+
+    def labels(self, *values: object) -> object:
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+            child = self.children[key] = self._make()
+        return child
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._families: dict[str, Family] = {}
+        self._callbacks: dict[str, tuple[str, str, tuple[str, ...], Callable[[], object]]] = {}
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, help, "counter", labels, Counter))
+
+    def histogram(self, name: str, help: str, bounds: Iterable[float], labels: tuple[str, ...] = ()) -> Family:
+        bounds = tuple(sorted(bounds))
+        return self._add(Family(name, help, "histogram", labels, lambda: Histogram(bounds)))
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], float | Mapping[LabelValues, float]],
+        kind: str = "gauge",
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        """Register a value read only at scrape time: a number, or {label values: number}.
+
+        Registering the same name again replaces the callback.
+        """
+        self._callbacks[name] = (help, kind, labels, read)
+
+    def _add(self, family: Family) -> Family:
+        if family.name in self._families or family.name in self._callbacks:
+            raise ValueError(f"metric {family.name} already registered")
+        self._families[family.name] = family
+        return family
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for fam in self._families.values():
+            lines.append(f"# HELP {fam.name} {fam.help}")
+            lines.append(f"# TYPE {fam.name} {fam.kind}")
+            for values, child in fam.children.items():
+                if isinstance(child, Histogram):
+                    _render_histogram(lines, fam.name, fam.labelnames, values, child)
+                else:
+                    lines.append(f"{fam.name}{_labels(fam.labelnames, values)} {_num(child.value)}")
+        for name, (help, kind, labelnames, read) in self._callbacks.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            value = read()
+            if isinstance(value, Mapping):
+                for values, v in value.items():
+                    lines.append(f"{name}{_labels(labelnames, values)} {_num(v)}")
+            else:
+                lines.append(f"{name} {_num(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _render_histogram(
+    lines: list[str], name: str, labelnames: tuple[str, ...], values: LabelValues, h: Histogram
+) -> None:
+    cumulative = 0
+    for bound, n in zip(h.bounds + (float("inf"),), h.counts):
+        cumulative += n
+        le = "+Inf" if bound == float("inf") else _num(bound)
+        lines.append(f"{name}_bucket{_labels(labelnames + ('le',), values + (le,))} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labelnames, values)} {_num(h.sum)}")
+    lines.append(f"{name}_count{_labels(labelnames, values)} {h.count}")
+
+
+def _labels(names: tuple[str, ...], values: Iterable[object]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+REGISTRY = Registry()
+
+# Seconds buckets from 0.1 ms to 0.5 s: a 20 Hz tick has 50 ms to spend.
+_SECONDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+
+TICK_SECONDS = REGISTRY.histogram(
+    "lt_tick_seconds", "Time to step and publish every active room for one tick.", _SECONDS
+).labels()
+TICK_LAG_SECONDS = REGISTRY.histogram(
+    "lt_tick_lag_seconds", "How late each tick fired relative to its slot.", _SECONDS
+).labels()
+SIMULATE_SECONDS = REGISTRY.histogram(
+    "lt_simulate_seconds", "Time to simulate one room for one tick.", _SECONDS, labels=("room_index",)
+)
+STATE_FRAME_BYTES = REGISTRY.histogram(
+    "lt_state_frame_bytes",
+    "Size of each state/state_delta frame handed to a connection (characters for JSON).",
+    (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+    labels=("format", "kind"),
+)
+STATE_FRAMES_CONFLATED = REGISTRY.counter(
+    "lt_state_frames_conflated_total", "State frames replaced in an outbox before they were sent."
+).labels()
+SLOW_CONSUMER_DROPS = REGISTRY.counter(
+    "lt_slow_consumer_drops_total", "Connections closed because their outbox backed up."
+).labels()
+ROOMS_HIBERNATED = REGISTRY.counter(
+    "lt_rooms_hibernated_total", "Idle rooms written to the hibernation store and dropped from memory."
+).labels()
+ROOMS_RESTORED = REGISTRY.counter("lt_rooms_restored_total", "Rooms loaded back from the hibernation store.").labels()
+REJECTED_MESSAGES = REGISTRY.counter(
+    "lt_rejected_messages_total", "Client frames refused before reaching a handler, by error code.", labels=("reason",)
+)
+RATE_LIMITED = REGISTRY.counter(
+    "lt_rate_limited_total", "Client frames dropped for exceeding their per-connection rate, by type.", labels=("type",)
+)
+RATE_LIMIT_DISCONNECTS = REGISTRY.counter(
+    "lt_rate_limit_disconnects_total", "Connections closed for repeatedly exceeding rate limits."
+).labels()
+ROOM_FAILURES = REGISTRY.counter(
+    "lt_room_failures_total", "Rooms taken off the tick schedule because stepping or publishing them raised."
+).labels()
+JOIN_SECONDS = REGISTRY.histogram(
+    "lt_join_seconds", "Time from receiving `join` to the player being seated.", _SECONDS
+).labels()
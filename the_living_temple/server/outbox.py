@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+
+from fastapi import WebSocket
+
+from .metrics import SLOW_CONSUMER_DROPS, STATE_FRAMES_CONFLATED
+
+
+# Queued events (roster, joined, errors) before the client counts as a slow consumer.
+OUTBOX_EVENTS = 64
+# A single frame taking longer than this to hand to the socket also counts.
+SEND_TIMEOUT = 5.0
+# Close code sent to slow consumers (private-use range).
+SLOW_CONSUMER_CLOSE = 4008
+
+
+class Outbox:
+    """Bounded send queue for one socket, drained by a single writer task.
+
+    Events are sent in order and never dropped; a client that lets them pile
+    past `max_events`, or stalls one send past `send_timeout`, is disconnected.
+    State frames are conflated: only the newest unsent one is kept, since each
+    supersedes the last. Events go out before a pending state frame.
+    """
+
+    def __init__(self, ws: WebSocket, max_events: int = OUTBOX_EVENTS, send_timeout: float = SEND_TIMEOUT) -> None:
+        self._ws = ws
+        self._max_events = max_events
+        self._send_timeout = send_timeout
+        self._events: deque[str | bytes] = deque()
+        self._state: str | bytes | None = None
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.closed = False
+        # State frames replaced before they were sent.
+        self.conflated = 0
+        # Seconds the most recent frame took to send.
+        self.last_send_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._events) + (self._state is not None)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+
+    def put_event(self, frame: str | bytes) -> None:
+        if self.closed:
+            return
+        if len(self._events) >= self._max_events:
+            self._drop_slow_consumer()
+            return
+        self._events.append(frame)
+        self._wake.set()
+
+    def put_state(self, frame: str | bytes) -> bool:
+        """Queue a state frame; True if it replaced one the socket hadn't taken yet."""
+        if self.closed:
+            return False
+        replaced = self._state is not None
+        if replaced:
+            self.conflated += 1
+            STATE_FRAMES_CONFLATED.inc()
+        self._state = frame
+        self._wake.set()
+        return replaced
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                while self._events or self._state is not None:
+                    if self._events:
+                        frame = self._events.popleft()
+                    else:
+                        frame, self._state = self._state, None
+                    # A timer rather than wait_for: wait_for can swallow a cancel that races
+                    # a finishing send, leaving the writer parked on _wake forever.
+                    watchdog = loop.call_later(self._send_timeout, self._drop_slow_consumer)
+                    started = time.perf_counter()
+                    try:
+                        await self._send(frame)
+                    finally:
+                        watchdog.cancel()
+                    self.last_send_time = time.perf_counter() - started
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket already gone; handle_socket sees the disconnect and cleans up.
+            self.closed = True
+
+    async def _send(self, frame: str | bytes) -> None:
+        if isinstance(frame, bytes):
+            await self._ws.send_bytes(frame)
+        else:
+            await self._ws.send_text(frame)
+
+    def _drop_slow_consumer(self) -> None:
+        if self.closed:
+            return
+        SLOW_CONSUMER_DROPS.inc()
+        self.close()
+        self._events.clear()
+        self._state = None
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self) -> None:
+        try:
+            await self._ws.close(code=SLOW_CONSUMER_CLOSE)
+        except Exception:
+            pass
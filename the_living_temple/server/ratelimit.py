@@ -0,0 +1,71 @@
+"""Per-connection token buckets for client frames.
+
+handle_socket charges every frame to the bucket for its type, before parsing
+when `schema.sniff_type` can read the type off the raw text. A frame over its
+limit is dropped unanswered and costs the connection a strike; strikes refill
+slowly, and a connection that runs out of them is closed. One socket can
+therefore neither grow its room's message log nor burn server CPU faster than
+a person (or a client's 20 Hz input loop) would.
+"""
+
+from __future__ import annotations
+
+import time
+
+
+# Sustained frames per second and burst, by message type. Inputs arrive every 50 ms and bunch up
+# after a network stall; the rest are paced by a person clicking.
+LIMITS: dict[str, tuple[float, float]] = {
+    "input": (30.0, 80.0),
+    "ping": (2.0, 6.0),
+    "quick_chat": (1.0, 5.0),
+    "ready": (2.0, 6.0),
+    "code_submit": (1.0, 5.0),
+    "hello": (1.0, 3.0),
+    "join": (1.0, 3.0),
+}
+# Refused frames (bad JSON, wrong shape, unknown type) share one bucket under this key.
+INVALID = "invalid"
+INVALID_LIMIT = (1.0, 5.0)
+# Violations: refill per second and how many may pile up before the connection is closed.
+STRIKE_LIMIT = (2.0, 30.0)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def take(self, now: float) -> bool:
+        tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if tokens < 1.0:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - 1.0
+        return True
+
+
+class RateLimiter:
+    """The buckets for one connection, each made on its type's first frame."""
+
+    def __init__(self, limits: dict[str, tuple[float, float]] = LIMITS) -> None:
+        self._limits = limits
+        self._buckets: dict[str, TokenBucket] = {}
+        self._strikes = TokenBucket(*STRIKE_LIMIT, time.monotonic())
+
+    def allow(self, kind: str) -> bool:
+        """Take one frame of `kind` (a message type or INVALID); False if it is over the limit."""
+        now = time.monotonic()
+        bucket = self._buckets.get(kind)
+        if bucket is None:
+            bucket = self._buckets[kind] = TokenBucket(*self._limits.get(kind, INVALID_LIMIT), now)
+        return bucket.take(now)
+
+    def strike(self) -> bool:
+        """Count a violation; True once they come too fast and the connection should be closed."""
+        return not self._strikes.take(time.monotonic())
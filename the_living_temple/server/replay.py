@@ -0,0 +1,316 @@
+"""Per-room input recording and headless replay.
+
+Opt in with LT_RECORD_DIR (see app.py): every room then appends one JSON
+line per event to `<dir>/<code>-<unix ms>.jsonl`. The first line is a
+header; the rest are `[tick, tag, ...]` with `tick` the room tick the event
+arrived in (after that tick was stepped, before the next):
+
+    {"v": 1, "code": "ABCDE", "seed": 449285, "sim_hz": 20, "resume_s": 20.0, "created_at": 1760000000.0}
+    [0, "j", 1, "guardian"]          join: player_id, role
+    [0, "r", 1, 1]                   ready: player_id, 0 | 1
+    [41, "i", 1, [[12, 1.0, 0.0, 0]]]  inputs accepted for player_id (seq, move_x, move_y, interact)
+    [60, "h", 2871734]               checksum of players and entities after stepping tick 60
+    [70, "a", 2]                     player_id's socket dropped, seat held
+    [70, "b", 2]                     player_id resumed the held seat
+    [88, "c", 2, "AB12CD34EF"]       code_submit
+    [89, "z"]                        room hibernated (see hibernate.py); sockets closed, seats held
+    [90, "l", 2]                     player_id left (or their held seat expired)
+    [90, "e"]                        room closed
+
+Only what feeds the simulation is kept: acks, pings and chat are not. The room
+seed comes from its code, so `python -m server.replay FILE` rebuilds the room
+through the same GameServer handlers, steps it tick by tick as fast as it can
+and checks every recorded checksum, reporting the first tick that diverges.
+A hibernated room that is restored keeps appending to the same file, and the
+replay hibernates and restores it the same way (through an in-memory store).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import zlib
+from pathlib import Path
+from typing import Any
+
+from .codec import dumps, loads
+from .scheduler import TickStats
+
+
+FORMAT_VERSION = 1
+# Ticks between state checksums (and buffer flushes): one a second at 20 Hz.
+CHECK_EVERY = 20
+
+
+def state_checksum(room: Any) -> int:
+    players = [(p.player_id, round(p.x, 3), round(p.y, 3), p.hp, p.down) for p in room.players.values()]
+    entities = [e.wire() for e in room.room_runtime.get("entities", [])]
+    # Stdlib json so recordings check out whether or not either side has orjson.
+    text = json.dumps([room.room_index, players, entities], separators=(",", ":"))
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class RoomLog:
+    """Append-only event log for one room; lines are buffered and appended in batches."""
+
+    def __init__(self, path: Path, header: dict[str, Any] | None) -> None:
+        self.path = path
+        # No header when reopening a restored room's log; it keeps appending to the same file.
+        self._lines = [json.dumps(header) + "\n"] if header is not None else []
+        self._closed = False
+
+    def _add(self, record: list[Any]) -> None:
+        if not self._closed:
+            self._lines.append(dumps(record) + "\n")
+
+    def join(self, tick: int, player_id: int, role: str) -> None:
+        self._add([tick, "j", player_id, role])
+
+    def leave(self, tick: int, player_id: int) -> None:
+        self._add([tick, "l", player_id])
+
+    def away(self, tick: int, player_id: int) -> None:
+        self._add([tick, "a", player_id])
+
+    def resumed(self, tick: int, player_id: int) -> None:
+        self._add([tick, "b", player_id])
+
+    def ready(self, tick: int, player_id: int, ready: bool) -> None:
+        self._add([tick, "r", player_id, int(ready)])
+
+    def inputs(self, tick: int, player_id: int, entries: list[tuple[int, float, float, bool]]) -> None:
+        self._add([tick, "i", player_id, [[seq, mx, my, int(held)] for seq, mx, my, held in entries]])
+
+    def code_submit(self, tick: int, player_id: int, code: str) -> None:
+        self._add([tick, "c", player_id, code])
+
+    def hibernated(self, tick: int) -> None:
+        self._add([tick, "z"])
+        self.flush()
+        self._closed = True
+
+    def stepped(self, room: Any) -> None:
+        if room.tick % CHECK_EVERY == 0:
+            self._add([room.tick, "h", state_checksum(room)])
+            self.flush()
+
+    def close(self, tick: int) -> None:
+        self._add([tick, "e"])
+        self.flush()
+        self._closed = True
+
+    def flush(self) -> None:
+        if not self._lines:
+            return
+        try:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.writelines(self._lines)
+        except OSError:
+            # Recording is best effort; never take a room down over it.
+            pass
+        self._lines = []
+
+
+class Recorder:
+    def __init__(self, directory: Path, sim_hz: int, resume_grace: float = 0.0) -> None:
+        self.directory = directory
+        self.sim_hz = sim_hz
+        self.resume_grace = resume_grace
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def open(self, room: Any, reopened: bool = False) -> RoomLog:
+        path = self.directory / f"{room.code}-{int(room.created_at * 1000)}.jsonl"
+        if reopened:
+            return RoomLog(path, None)
+        header = {
+            "v": FORMAT_VERSION,
+            "code": room.code,
+            "seed": room.rng_seed,
+            "sim_hz": self.sim_hz,
+            "resume_s": self.resume_grace,
+            "created_at": room.created_at,
+        }
+        return RoomLog(path, header)
+
+
+# --- replay
+
+
+class Desync(Exception):
+    pass
+
+
+class _NullSocket:
+    async def send_json(self, msg: Any) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        pass
+
+    async def send_bytes(self, data: bytes) -> None:
+        pass
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class _ManualScheduler:
+    """Stands in for TickScheduler: tracks active rooms, the replay loop does the stepping."""
+
+    def __init__(self) -> None:
+        self.stats = TickStats()
+        self._rooms: dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def __contains__(self, room: Any) -> bool:
+        return room.code in self._rooms
+
+    def add(self, room: Any) -> None:
+        self._rooms[room.code] = room
+
+    def discard(self, room: Any) -> None:
+        self._rooms.pop(room.code, None)
+
+    def stop(self) -> None:
+        pass
+
+
+class _MemoryStore:
+    """Stands in for hibernate.RoomStore; snapshots still round-trip through JSON."""
+
+    def __init__(self) -> None:
+        self._rooms: dict[str, str] = {}
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._rooms
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def save(self, code: str, snapshot: dict[str, Any]) -> int:
+        self._rooms[code] = dumps(snapshot)
+        return len(self._rooms[code])
+
+    def load(self, code: str) -> dict[str, Any] | None:
+        text = self._rooms.pop(code, None)
+        return None if text is None else loads(text)
+
+    def prune(self) -> int:
+        return 0
+
+
+def load(path: Path) -> tuple[dict[str, Any], list[list[Any]]]:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    header = json.loads(lines[0])
+    if header.get("v") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported recording version {header.get('v')!r}")
+    return header, [json.loads(line) for line in lines[1:] if line.strip()]
+
+
+async def replay(header: dict[str, Any], records: list[list[Any]], broadcast: bool = False) -> dict[str, Any]:
+    """Re-run a recording; raises Desync at the first checksum that differs."""
+    # game_server imports this module for RoomLog.
+    from .game_server import GameServer
+
+    # Held seats only end through recorded "l" events; the real expiry never fires this fast.
+    # Likewise rooms only hibernate at recorded "z" events, never from idle time.
+    server = GameServer(
+        sim_hz=header["sim_hz"], resume_grace=header.get("resume_s", 0.0), store=_MemoryStore(), idle_s=math.inf
+    )
+    server._scheduler = _ManualScheduler()
+    code = header["code"]
+    sockets: dict[int, _NullSocket] = {}
+    room = None
+    checks = 0
+    started = time.perf_counter()
+
+    for record in records:
+        tick, tag = record[0], record[1]
+        while room is not None and room.tick < tick:
+            if not (room.started and room.conns and room in server._scheduler):
+                raise Desync(f"recording reaches tick {tick} but the room stopped at {room.tick}")
+            server._step_room(room)
+            if broadcast:
+                await server._broadcast_state(room)
+
+        if tag == "j":
+            ws = _NullSocket()
+            joined_room, player_id = await server._handle_join(ws, {"room_code": code})
+            if player_id != record[2]:
+                raise Desync(f"tick {tick}: join seated player {player_id}, recording has {record[2]}")
+            room = joined_room
+            sockets[player_id] = ws
+        elif room is None:
+            raise ValueError(f"tick {tick}: {tag!r} before any join")
+        elif tag == "i":
+            await server._handle_input(room, record[2], {"type": "input", "inputs": record[3]})
+        elif tag == "r":
+            await server._handle_ready(room, record[2], {"type": "ready", "ready": bool(record[3])})
+        elif tag == "c":
+            await server._handle_code_submit(room, record[2], {"code": record[3]})
+        elif tag == "a":
+            ws = sockets.pop(record[2])
+            await server._disconnect(id(ws), ws)
+        elif tag == "b":
+            ws = _NullSocket()
+            token = room.players[record[2]].resume_token
+            # After a "z" this restores the room, as a new Room object.
+            room, player_id = await server._handle_join(ws, {"room_code": code, "resume_token": token})
+            if player_id != record[2]:
+                raise Desync(f"tick {tick}: resume seated player {player_id}, recording has {record[2]}")
+            sockets[player_id] = ws
+        elif tag == "l":
+            ws = sockets.pop(record[2], None)
+            if ws is not None:
+                await server._disconnect(id(ws), ws)
+            await server._release(room, record[2])
+        elif tag == "h":
+            checks += 1
+            actual = state_checksum(room)
+            if actual != record[2]:
+                raise Desync(f"tick {tick}: state checksum {actual} != recorded {record[2]}")
+        elif tag == "z":
+            if not await server._hibernate(room):
+                raise Desync(f"tick {tick}: room could not be hibernated")
+            sockets.clear()
+        elif tag == "e":
+            break
+
+    for ws in sockets.values():
+        await server._disconnect(id(ws), ws)
+    elapsed = time.perf_counter() - started
+    ticks = room.tick if room is not None else 0
+    return {"code": code, "ticks": ticks, "checks": checks, "seconds": elapsed, "ticks_per_s": ticks / elapsed}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-simulate recorded rooms and check them for desyncs.")
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--broadcast", action="store_true", help="also build state frames every tick")
+    parser.add_argument("--repeat", type=int, default=1, help="replay each file this many times (benchmarking)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.files:
+        header, records = load(path)
+        for _ in range(args.repeat):
+            try:
+                result = asyncio.run(replay(header, records, broadcast=args.broadcast))
+            except Desync as exc:
+                print(f"{path}: DESYNC {exc}")
+                failed = True
+                break
+            print(
+                f"{path}: {result['ticks']} ticks, {result['checks']} checksums ok, "
+                f"{result['seconds']:.3f}s ({result['ticks_per_s']:.0f} ticks/s)"
+            )
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Room layouts, hazards and puzzle parameters loaded from shared/rooms.json,
+and the player movement rules from shared/movement.json.
+
+The JSON is compiled once at import into frozen `RoomDef`s: entity specs to
+instantiate per run, hazards with their cycles resolved to entity indexes, a
+spatial grid over the entities that never move, and the puzzle parameters for
+the room's `kind` (see `rooms.KINDS`). Everything here is immutable and shared
+by every Room on the worker.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple
+
+from .entities import OPTIONAL_FIELDS, Entity
+from .spatial import UniformGrid
+
+
+SHARED_DIR = Path(__file__).resolve().parent.parent / "shared"
+ROOMS_PATH = SHARED_DIR / "rooms.json"
+# Also read by the client for local prediction; keep both sides on the same numbers.
+MOVEMENT_PATH = SHARED_DIR / "movement.json"
+# Spatial grid cell size in px; about the largest interact radius, so radius queries touch a few cells.
+GRID_CELL = 64.0
+
+
+class Rect(NamedTuple):
+    x: float
+    y: float
+    w: float
+    h: float
+
+    def contains(self, x: float, y: float) -> bool:
+        return self.x <= x <= self.x + self.w and self.y <= y <= self.y + self.h
+
+
+class EntitySpec(NamedTuple):
+    key: str | None
+    type: str
+    x: float
+    y: float
+    w: float
+    h: float
+    init: tuple[tuple[str, Any], ...]
+    # Position or size changes at runtime ("moves" in rooms.json); kept out of the grid.
+    moves: bool = False
+
+    def instantiate(self) -> Entity:
+        return Entity(self.key, self.type, self.x, self.y, self.w, self.h, **dict(self.init))
+
+
+# Phase boundaries count as "off" even when float rounding lands a hair past them.
+_PHASE_EPS = 1e-9
+
+
+class Cycle(NamedTuple):
+    """On/off cycle over room time: on while phase < on_before, or phase > on_after."""
+
+    period_s: float
+    on_before: float | None
+    on_after: float | None
+
+    def active(self, t: float) -> bool:
+        phase = (t % self.period_s) / self.period_s
+        if self.on_before is not None:
+            return phase < self.on_before - _PHASE_EPS
+        return phase > self.on_after + _PHASE_EPS
+
+
+class HazardDef(NamedTuple):
+    entity: int
+    source: str
+    damage: int
+    cooldown_s: float
+    # Drives entity.active each tick when set.
+    cycle: Cycle | None
+    # Puzzle flag gating the hazard instead of entity.active (e.g. flood level).
+    while_flag: str | None
+
+
+class Movement(NamedTuple):
+    input_dt: float
+    speed: Mapping[str, float]
+    bounds: Rect
+    # Players can't pass the exit door's x while it is closed.
+    door_closed_max_x: float
+
+
+@dataclass(frozen=True)
+class RoomDef:
+    index: int
+    title: str
+    kind: str
+    exit_zone: Rect
+    spawns: Mapping[str, tuple[float, float]]
+    entities: tuple[EntitySpec, ...]
+    hazards: tuple[HazardDef, ...]
+    params: Mapping[str, Any]
+    # Entity index by id.
+    keys: Mapping[str, int]
+    # Static entities only; `mobile` lists the indexes of the rest.
+    grid: UniformGrid
+    mobile: tuple[int, ...]
+    # Static plates alone, for the per-tick occupancy pass.
+    plate_grid: UniformGrid
+    # Hazard indexes gridded by their (static) entity's rect, and those on mobile entities.
+    hazard_grid: UniformGrid
+    mobile_hazards: tuple[int, ...]
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _rect(raw: dict[str, Any]) -> Rect:
+    return Rect(float(raw["x"]), float(raw["y"]), float(raw["w"]), float(raw["h"]))
+
+
+def _entity(raw: dict[str, Any]) -> EntitySpec:
+    init = tuple((name, raw[name]) for name in OPTIONAL_FIELDS if name in raw)
+    return EntitySpec(
+        raw.get("id"), raw["type"], raw["x"], raw["y"], raw.get("w", 0), raw.get("h", 0), init, bool(raw.get("moves"))
+    )
+
+
+def _hazard(raw: dict[str, Any], keys: dict[str, int], where: str) -> HazardDef:
+    ref = raw["entity"]
+    if ref not in keys:
+        raise ValueError(f"{where}: hazard references unknown entity {ref!r}")
+    cycle = None
+    if "cycle" in raw:
+        c = raw["cycle"]
+        if ("on_before" in c) == ("on_after" in c):
+            raise ValueError(f"{where}: hazard cycle needs exactly one of on_before/on_after")
+        cycle = Cycle(float(c["period_s"]), c.get("on_before"), c.get("on_after"))
+    return HazardDef(
+        keys[ref],
+        raw.get("source", ref),
+        int(raw.get("damage", 1)),
+        float(raw.get("cooldown_s", 0.5)),
+        cycle,
+        raw.get("while"),
+    )
+
+
+def load_room_defs(path: Path = ROOMS_PATH) -> tuple[RoomDef, ...]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    exit_zone = _rect(data["exit_zone"])
+    spawns = MappingProxyType({role: (float(x), float(y)) for role, (x, y) in data["spawns"].items()})
+
+    defs = []
+    for index, raw in enumerate(data["rooms"]):
+        where = f"{path.name} room {index}"
+        entities = tuple(_entity(e) for e in raw["entities"])
+        keys = {e.key: i for i, e in enumerate(entities) if e.key}
+        if len(keys) != sum(1 for e in entities if e.key):
+            raise ValueError(f"{where}: duplicate entity ids")
+        hazards = tuple(_hazard(h, keys, where) for h in raw.get("hazards", []))
+        mobile = tuple(i for i, e in enumerate(entities) if e.moves)
+        defs.append(
+            RoomDef(
+                index=index,
+                title=raw.get("title", ""),
+                kind=raw["kind"],
+                exit_zone=_rect(raw["exit_zone"]) if "exit_zone" in raw else exit_zone,
+                spawns=spawns,
+                entities=entities,
+                hazards=hazards,
+                params=_freeze(raw.get("puzzle", {})),
+                keys=MappingProxyType(keys),
+                grid=UniformGrid(((i, e[2:6]) for i, e in enumerate(entities) if not e.moves), GRID_CELL),
+                mobile=mobile,
+                plate_grid=UniformGrid(
+                    ((i, e[2:6]) for i, e in enumerate(entities) if e.type == "plate" and not e.moves), GRID_CELL
+                ),
+                hazard_grid=UniformGrid(
+                    ((h, entities[hz.entity][2:6]) for h, hz in enumerate(hazards) if hz.entity not in mobile), GRID_CELL
+                ),
+                mobile_hazards=tuple(h for h, hz in enumerate(hazards) if hz.entity in mobile),
+            )
+        )
+    return tuple(defs)
+
+
+def load_movement(path: Path = MOVEMENT_PATH) -> Movement:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    b = data["bounds"]
+    bounds = Rect(float(b["min_x"]), float(b["min_y"]), b["max_x"] - b["min_x"], b["max_y"] - b["min_y"])
+    return Movement(
+        input_dt=float(data["input_dt"]),
+        speed=MappingProxyType({role: float(v) for role, v in data["speed"].items()}),
+        bounds=bounds,
+        door_closed_max_x=float(data["door_closed_max_x"]),
+    )
@@ -1,118 +1,173 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Callable, Mapping, NamedTuple
 
+from .entities import Entity, index_entities
+from .room_defs import RoomDef, load_room_defs
 from .util import clamp, dist2
 
 
-ROOM_COUNT = 5
+ROOM_DEFS = load_room_defs()
+ROOM_COUNT = len(ROOM_DEFS)
 
 
-def build_room(room_index: int, fragment: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
-    static: dict[str, Any] = {
-        "room_index": room_index,
-        "exit_zone": {"x": 900, "y": 200, "w": 60, "h": 140},
-    }
+class RoomKind(NamedTuple):
+    """Puzzle handlers for one `kind` in shared/rooms.json.
+
+    build(pz, params, ents) fills the runtime puzzle dict from the room's
+    params and its entities by id; tick(room, params, dt) runs after hazard
+    cycles and before hazard damage; interact(room, params, ps) handles a
+    held interact from `ps`. Kinds with `occupancy` set get rt["occupied"]
+    (plates someone stands on) refreshed before their tick; see `_occupied`.
+    """
+
+    build: Callable[[dict[str, Any], Mapping[str, Any], dict[str, Entity]], None]
+    tick: Callable[[Any, Mapping[str, Any], float], None]
+    interact: Callable[[Any, Mapping[str, Any], Any], None]
+    occupancy: bool = False
+
+
+class _Template(NamedTuple):
+    """Fresh-room values a reset restores in place: entity fields and scalar runtime/puzzle keys."""
+
+    entities: tuple[tuple[Any, ...], ...]
+    runtime: tuple[tuple[str, Any], ...]
+    puzzle: tuple[tuple[str, Any], ...]
 
+
+_SCALARS = (type(None), bool, int, float, str)
+
+
+def _new_runtime(room_index: int) -> dict[str, Any]:
+    room_def = ROOM_DEFS[room_index]
+    entities = index_entities([spec.instantiate() for spec in room_def.entities])
     runtime: dict[str, Any] = {
         "door_open": False,
         "fragment_awarded": False,
-        "entities": [],
+        "entities": entities,
+        "door": next((e for e in entities if e.type == "door"), None),
         "puzzle": {},
+        # Indexes of static plates some player stands on, refreshed by room_tick.
+        "occupied": set(),
     }
+    _DISPATCH[room_index].build(runtime["puzzle"], room_def.params, {e.key: e for e in entities if e.key})
+    return runtime
+
+
+def _make_template(room_index: int) -> _Template:
+    rt = _new_runtime(room_index)
+    return _Template(
+        entities=tuple(e.save() for e in rt["entities"]),
+        runtime=tuple((k, v) for k, v in rt.items() if isinstance(v, _SCALARS)),
+        puzzle=tuple((k, v) for k, v in rt["puzzle"].items() if isinstance(v, _SCALARS)),
+    )
 
-    if room_index == 0:
-        _room1(runtime)
-    elif room_index == 1:
-        _room2(runtime)
-    elif room_index == 2:
-        _room3(runtime)
-    elif room_index == 3:
-        _room4(runtime)
-    elif room_index == 4:
-        _room5(runtime)
 
+def build_room(room_index: int, fragment: dict[str, Any]) -> tuple[RoomDef, dict[str, Any]]:
+    runtime = _new_runtime(room_index)
     runtime["puzzle"]["fragment_hint"] = {"frag": fragment["frag"], "hint": fragment["hint"]}
-    return static, runtime
+    return ROOM_DEFS[room_index], runtime
 
 
 def reset_room_runtime_state(room: Any) -> None:
-    frag = room.code_fragments[room.room_index]
-    room.room_static, room.room_runtime = build_room(room.room_index, frag)
+    """Put the current room back to its fresh state without reallocating it.
+
+    Entities, the puzzle dict and its entity/list references are kept; only
+    fields that moved away from the template are written back, and entities
+    that never changed keep their cached wire dicts. The epoch is still bumped:
+    a reset clears optional fields (`open`, `read`, ...), which leave the wire
+    dict rather than change in it, so a delta could not carry them.
+    """
+    tpl = _TEMPLATES[room.room_index]
+    rt = room.room_runtime
+    for ent, saved in zip(rt["entities"], tpl.entities):
+        ent.restore(saved)
+    # Drop flags set after the room was built (e.g. final_unlocked).
+    for key in [k for k, v in rt.items() if isinstance(v, _SCALARS)]:
+        del rt[key]
+    rt.update(tpl.runtime)
+    rt["puzzle"].update(tpl.puzzle)
     for ps in room.players.values():
         ps.hp = 30
         ps.down = False
         ps.revive_progress = 0.0
         ps.damage_cd.clear()
+    room.epoch += 1
+
+
+def save_room_runtime(rt: dict[str, Any]) -> dict[str, Any]:
+    """JSON-safe copy of what a run changes: the same fields a reset restores (see _Template)."""
+    return {
+        "entities": [e.save() for e in rt["entities"]],
+        "runtime": {k: v for k, v in rt.items() if isinstance(v, _SCALARS)},
+        "puzzle": {k: v for k, v in rt["puzzle"].items() if isinstance(v, _SCALARS)},
+    }
+
+
+def restore_room_runtime(rt: dict[str, Any], saved: dict[str, Any]) -> None:
+    """Apply `save_room_runtime` output to a runtime fresh from build_room for the same room_index.
+
+    Entity and puzzle references, lists built from params and per-tick scratch
+    (e.g. "occupied") are rebuilt by build_room, so only the scalars travel.
+    """
+    for ent, values in zip(rt["entities"], saved["entities"]):
+        ent.restore(values)
+    for key in [k for k, v in rt.items() if isinstance(v, _SCALARS)]:
+        del rt[key]
+    rt.update(saved["runtime"])
+    rt["puzzle"].update(saved["puzzle"])
 
 
 def room_apply_interact(room: Any, player_id: int) -> None:
-    rt = room.room_runtime
     ps = room.players.get(player_id)
     if not ps:
         return
-
-    def near(ent: dict[str, Any], r: float = 48.0) -> bool:
-        cx = ent["x"] + ent.get("w", 0) / 2.0
-        cy = ent["y"] + ent.get("h", 0) / 2.0
-        return dist2(ps.x, ps.y, cx, cy) <= r * r
-
-    if room.room_index == 1:
-        mural = rt["puzzle"].get("mural")
-        if mural and near(mural, 60.0) and ps.role == "scholar":
-            rt["puzzle"]["mural_read"] = True
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Scholar read the mural."})
-        for lever in rt["puzzle"].get("levers", []):
-            if near(lever, 55.0) and ps.role == "guardian":
-                lever["state"] = (lever["state"] + 1) % 3
-                _room2_check(room)
-                return
-
-    if room.room_index == 2:
-        block = rt["puzzle"].get("block")
-        if block and ps.role == "guardian" and near(block, 55.0):
-            rt["puzzle"]["block_grabbed_by"] = player_id
-            return
-        sw = rt["puzzle"].get("switch")
-        if sw and ps.role == "scholar" and near(sw, 55.0):
-            rt["puzzle"]["switch_on"] = True
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Switch activated."})
-            _room3_check(room)
-            return
-
-    if room.room_index == 3:
-        sign = rt["puzzle"].get("sign")
-        if sign and ps.role == "scholar" and near(sign, 60.0):
-            rt["puzzle"]["order_revealed"] = True
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Scholar read pipe markings."})
-            return
-        for valve in rt["puzzle"].get("valves", []):
-            if near(valve, 60.0) and ps.role == "guardian":
-                _room4_turn_valve(room, valve["id"])
-                return
-
-    if room.room_index == 4:
-        panel = rt["puzzle"].get("panel")
-        if panel and near(panel, 70.0):
-            rt["puzzle"]["panel_active"] = True
+    _DISPATCH[room.room_index].interact(room, room.room_static.params, ps)
 
 
 def room_tick(room: Any, dt: float) -> None:
-    idx = room.room_index
-    if idx == 0:
-        _room1_tick(room, dt)
-    elif idx == 1:
-        _room2_tick(room, dt)
-    elif idx == 2:
-        _room3_tick(room, dt)
-    elif idx == 3:
-        _room4_tick(room, dt)
-    elif idx == 4:
-        _room5_tick(room, dt)
+    room_def: RoomDef = room.room_static
+    rt = room.room_runtime
+    entities = rt["entities"]
+    for hz in room_def.hazards:
+        if hz.cycle is not None:
+            entities[hz.entity].active = hz.cycle.active(room.time)
+
+    kind = _DISPATCH[room.room_index]
+    if kind.occupancy:
+        # One grid lookup per player rather than every plate against every player.
+        occupied = rt["occupied"]
+        occupied.clear()
+        cells, size = room_def.plate_grid.cells, room_def.plate_grid.cell
+        for ps in room.players.values():
+            for i in cells.get((ps.x // size, ps.y // size), ()):
+                if _player_in_rect(ps, entities[i]):
+                    occupied.add(i)
+
+    kind.tick(room, room_def.params, dt)
+
+    if room_def.hazards:
+        pz = rt["puzzle"]
+        hazards = room_def.hazards
+        cells, size = room_def.hazard_grid.cells, room_def.hazard_grid.cell
+        mobile = room_def.mobile_hazards
+        for ps in room.players.values():
+            candidates = cells.get((ps.x // size, ps.y // size), ())
+            if mobile:
+                # Ascending like a full scan, so cooldowns and "is down" messages land the same way.
+                candidates = tuple(sorted((*candidates, *mobile))) if candidates else mobile
+            for h in candidates:
+                hz = hazards[h]
+                ent = entities[hz.entity]
+                on = pz.get(hz.while_flag) if hz.while_flag else ent.active
+                if on and _player_in_rect(ps, ent):
+                    _damage(room, ps, hz.damage, hz.source, cooldown_s=hz.cooldown_s)
+
+    _sync_door_entity(rt)
 
 
 def _damage(room: Any, ps: Any, amount: int, source: str, cooldown_s: float = 0.5) -> None:
-    now = room.tick / 20.0
+    now = room.time
     last = ps.damage_cd.get(source, -999.0)
     if (now - last) < cooldown_s:
         return
@@ -125,296 +180,282 @@ def _damage(room: Any, ps: Any, amount: int, source: str, cooldown_s: float = 0.
     if ps.hp <= 0:
         ps.hp = 0
         ps.down = True
-        room.messages.append({"t": room.tick, "kind": "system", "text": f"Player {ps.player_id} is down!"})
+        room.add_message({"t": room.tick, "kind": "system", "text": f"Player {ps.player_id} is down!"})
 
 
 def _sync_door_entity(rt: dict[str, Any]) -> None:
-    for ent in rt.get("entities", []):
-        if ent.get("type") == "door":
-            ent["open"] = bool(rt.get("door_open", False))
+    door = rt.get("door")
+    if door is not None:
+        door.open = bool(rt.get("door_open", False))
 
 
-def _player_in_rect(ps: Any, rect: dict[str, Any]) -> bool:
-    return (
-        rect["x"] <= ps.x <= rect["x"] + rect.get("w", 0)
-        and rect["y"] <= ps.y <= rect["y"] + rect.get("h", 0)
-    )
+def _near(ps: Any, ent: Entity, r: float) -> bool:
+    cx = ent.x + ent.w / 2.0
+    cy = ent.y + ent.h / 2.0
+    return dist2(ps.x, ps.y, cx, cy) <= r * r
 
 
-def _any_player_in_rect(room: Any, rect: dict[str, Any]) -> bool:
+def _player_in_rect(ps: Any, rect: Entity) -> bool:
+    x = rect.x
+    y = rect.y
+    return x <= ps.x <= x + rect.w and y <= ps.y <= y + rect.h
+
+
+def _any_player_in_rect(room: Any, rect: Entity) -> bool:
     return any(_player_in_rect(ps, rect) for ps in room.players.values())
 
 
-def _rect_overlap(a: dict[str, Any], b: dict[str, Any]) -> bool:
-    return not (
-        a["x"] + a.get("w", 0) < b["x"]
-        or a["x"] > b["x"] + b.get("w", 0)
-        or a["y"] + a.get("h", 0) < b["y"]
-        or a["y"] > b["y"] + b.get("h", 0)
-    )
+def _occupied(room: Any, ent: Entity) -> bool:
+    """Whether any player stands in `ent`; static plates read room_tick's occupancy pass."""
+    # Only plates are gridded for occupancy; anything else (or a moving plate) gets the full check.
+    if ent.type != "plate" or ent.eid in room.room_static.mobile:
+        return _any_player_in_rect(room, ent)
+    return ent.eid in room.room_runtime["occupied"]
 
 
-def _room1(rt: dict[str, Any]) -> None:
-    plate_a = {"id": "plate_a", "type": "plate", "x": 240, "y": 360, "w": 46, "h": 46}
-    plate_b = {"id": "plate_b", "type": "plate", "x": 690, "y": 150, "w": 46, "h": 46}
-    # Two spike columns that form a timed barrier between left (spawn/plate_a) and right (plate_b/exit).
-    # Important: do NOT overlap plate_b, otherwise it can get visually obscured.
-    spikes_l = {"id": "spikes_1_l", "type": "spikes", "x": 410, "y": 20, "w": 110, "h": 500}
-    spikes_r = {"id": "spikes_1_r", "type": "spikes", "x": 560, "y": 20, "w": 110, "h": 500}
-    rt["puzzle"] = {
-        "plate_a": plate_a,
-        "plate_b": plate_b,
-        "spikes_l": spikes_l,
-        "spikes_r": spikes_r,
-        "hold_t": 0.0,
-    }
-    rt["entities"] = [
-        plate_a,
-        plate_b,
-        spikes_l,
-        spikes_r,
-        {"type": "door", "x": 885, "y": 240, "w": 30, "h": 80},
-    ]
+def _first_near(room: Any, ps: Any, keys: tuple[str, ...], r: float) -> Entity | None:
+    """First static entity named in `keys` (in that order) within r of the player."""
+    room_def: RoomDef = room.room_static
+    near = room_def.grid.around(ps.x, ps.y, r)
+    if not near:
+        return None
+    entities = room.room_runtime["entities"]
+    hits = {i for i in near if _near(ps, entities[i], r)}
+    for key in keys:
+        i = room_def.keys[key]
+        if i in hits:
+            return entities[i]
+    return None
 
 
-def _room1_tick(room: Any, dt: float) -> None:
-    rt = room.room_runtime
-    plate_a = rt["puzzle"]["plate_a"]
-    plate_b = rt["puzzle"]["plate_b"]
-    spikes_l = rt["puzzle"]["spikes_l"]
-    spikes_r = rt["puzzle"]["spikes_r"]
-
-    # 2s cycle (20Hz -> 40 ticks). The two columns are phase-shifted to reduce trivial waiting.
-    phase = (room.tick % 40) / 40.0
-    # Active 70% / inactive 30% with an overlap window -> forces timing or tanking (Guardian advantage).
-    spikes_l_active = phase < 0.7
-    spikes_r_active = phase > 0.3
-    spikes_l["active"] = spikes_l_active
-    spikes_r["active"] = spikes_r_active
-
-    a_on = _any_player_in_rect(room, plate_a)
-    b_on = _any_player_in_rect(room, plate_b)
-    if a_on and b_on:
-        rt["puzzle"]["hold_t"] += dt
-    else:
-        rt["puzzle"]["hold_t"] = max(0.0, rt["puzzle"]["hold_t"] - dt * 2.0)
+def _rect_overlap(a: Entity, b: Entity) -> bool:
+    return not (a.x + a.w < b.x or a.x > b.x + b.w or a.y + a.h < b.y or a.y > b.y + b.h)
 
-    for ps in room.players.values():
-        if spikes_l_active and _player_in_rect(ps, spikes_l):
-            _damage(room, ps, 1, "spikes_1_l", cooldown_s=0.28)
-        if spikes_r_active and _player_in_rect(ps, spikes_r):
-            _damage(room, ps, 1, "spikes_1_r", cooldown_s=0.28)
 
-    if rt["puzzle"]["hold_t"] >= 0.8:
-        rt["door_open"] = True
-    _sync_door_entity(rt)
+def _noop_interact(room: Any, params: Mapping[str, Any], ps: Any) -> None:
+    return None
 
 
-def _room2(rt: dict[str, Any]) -> None:
-    mural = {"id": "mural", "type": "mural", "x": 180, "y": 110, "w": 60, "h": 80}
-    levers = [
-        {"id": "lever1", "type": "lever", "x": 520, "y": 110, "w": 30, "h": 60, "state": 0},
-        {"id": "lever2", "type": "lever", "x": 590, "y": 110, "w": 30, "h": 60, "state": 0},
-        {"id": "lever3", "type": "lever", "x": 660, "y": 110, "w": 30, "h": 60, "state": 0},
-    ]
-    target = [2, 0, 1]  # 0..2
-    rt["puzzle"] = {
-        "mural": mural,
-        "mural_read": False,
-        "levers": levers,
-        "target": target,
-        "solved": False,
-    }
-    rt["entities"] = [mural, *levers, {"type": "door", "x": 885, "y": 240, "w": 30, "h": 80}]
+# --- plates_hold: every plate held together for hold_s opens the door
+
 
+def _plates_hold_build(pz: dict[str, Any], params: Mapping[str, Any], ents: dict[str, Entity]) -> None:
+    pz["plates"] = [ents[k] for k in params["plates"]]
+    pz["hold_t"] = 0.0
 
-def _room2_tick(room: Any, dt: float) -> None:
+
+def _plates_hold_tick(room: Any, params: Mapping[str, Any], dt: float) -> None:
     rt = room.room_runtime
     pz = rt["puzzle"]
-    mural = pz.get("mural")
-    if mural:
-        mural["read"] = bool(pz.get("mural_read"))
-    _sync_door_entity(rt)
+    if all(_occupied(room, plate) for plate in pz["plates"]):
+        pz["hold_t"] += dt
+    else:
+        pz["hold_t"] = max(0.0, pz["hold_t"] - dt * params["release_rate"])
+    if pz["hold_t"] >= params["hold_s"]:
+        rt["door_open"] = True
+
 
+# --- levers: scholar reads the mural, guardian sets levers to the target
 
-def _room2_check(room: Any) -> None:
+
+def _levers_build(pz: dict[str, Any], params: Mapping[str, Any], ents: dict[str, Entity]) -> None:
+    pz["mural"] = ents[params["mural"]]
+    pz["mural_read"] = False
+    pz["levers"] = [ents[k] for k in params["levers"]]
+    pz["target"] = list(params["target"])
+    pz["solved"] = False
+
+
+def _levers_tick(room: Any, params: Mapping[str, Any], dt: float) -> None:
+    pz = room.room_runtime["puzzle"]
+    pz["mural"].read = bool(pz["mural_read"])
+
+
+def _levers_interact(room: Any, params: Mapping[str, Any], ps: Any) -> None:
+    pz = room.room_runtime["puzzle"]
+    if ps.role == "scholar" and _near(ps, pz["mural"], params["read_radius"]):
+        pz["mural_read"] = True
+        room.add_message({"t": room.tick, "kind": "system", "text": "Scholar read the mural."})
+    if ps.role != "guardian":
+        return
+    lever = _first_near(room, ps, params["levers"], params["lever_radius"])
+    if lever is not None:
+        lever.state = (lever.state + 1) % params["positions"]
+        _levers_check(room, params)
+
+
+def _levers_check(room: Any, params: Mapping[str, Any]) -> None:
     rt = room.room_runtime
-    levers = rt["puzzle"]["levers"]
-    target = rt["puzzle"]["target"]
-    current = [l["state"] for l in levers]
-    if current == target:
-        rt["puzzle"]["solved"] = True
+    pz = rt["puzzle"]
+    if [l.state for l in pz["levers"]] == pz["target"]:
+        pz["solved"] = True
         rt["door_open"] = True
-        room.messages.append({"t": room.tick, "kind": "system", "text": "Levers solved!"})
+        room.add_message({"t": room.tick, "kind": "system", "text": "Levers solved!"})
     else:
+        wrong = params["wrong"]
         toggler = room.players.get(1)
         if toggler:
-            _damage(room, toggler, 1, "arrow_room2", cooldown_s=0.5)
-
-
-def _room3(rt: dict[str, Any]) -> None:
-    block = {"id": "block", "type": "block", "x": 360, "y": 300, "w": 50, "h": 50}
-    plate = {"id": "plate", "type": "plate", "x": 610, "y": 320, "w": 46, "h": 46}
-    spikes = {"id": "spikes_3", "type": "spikes", "x": 520, "y": 210, "w": 220, "h": 80, "active": True}
-    sw = {"id": "switch", "type": "switch", "x": 800, "y": 150, "w": 40, "h": 40}
-    rt["puzzle"] = {
-        "block": block,
-        "plate": plate,
-        "spikes": spikes,
-        "switch": sw,
-        "block_grabbed_by": None,
-        "switch_on": False,
-    }
-    rt["entities"] = [block, plate, spikes, sw, {"type": "door", "x": 885, "y": 240, "w": 30, "h": 80}]
+            _damage(room, toggler, wrong["damage"], wrong["source"], cooldown_s=wrong["cooldown_s"])
 
 
-def _room3_tick(room: Any, dt: float) -> None:
-    rt = room.room_runtime
-    pz = rt["puzzle"]
+# --- block_plate: guardian pushes the block onto the plate to drop spikes, scholar flips the switch
+
+
+def _block_plate_build(pz: dict[str, Any], params: Mapping[str, Any], ents: dict[str, Entity]) -> None:
+    pz["block"] = ents[params["block"]]
+    pz["plate"] = ents[params["plate"]]
+    pz["spikes"] = ents[params["spikes"]]
+    pz["switch"] = ents[params["switch"]]
+    pz["block_grabbed_by"] = None
+    pz["switch_on"] = False
+
+
+def _block_plate_tick(room: Any, params: Mapping[str, Any], dt: float) -> None:
+    pz = room.room_runtime["puzzle"]
     block = pz["block"]
-    plate = pz["plate"]
-    spikes = pz["spikes"]
-    sw = pz.get("switch")
 
-    grabber_id = pz.get("block_grabbed_by")
-    if grabber_id == 1:
+    if pz.get("block_grabbed_by") == 1:
         conn = room.conns.get(1)
         if conn and conn.interact_held:
-            block["x"] += conn.move_x * 120.0 * dt
-            block["y"] += conn.move_y * 120.0 * dt
-            block["x"] = clamp(block["x"], 80.0, 860.0)
-            block["y"] = clamp(block["y"], 80.0, 460.0)
+            x0, y0, x1, y1 = map(float, params["block_bounds"])
+            speed = params["push_speed"]
+            block.x = clamp(block.x + conn.move_x * speed * dt, x0, x1)
+            block.y = clamp(block.y + conn.move_y * speed * dt, y0, y1)
         else:
             pz["block_grabbed_by"] = None
     else:
         pz["block_grabbed_by"] = None
 
-    on_plate = _rect_overlap(block, plate)
-    spikes["active"] = not on_plate
-    if spikes["active"]:
-        for ps in room.players.values():
-            if _player_in_rect(ps, spikes):
-                _damage(room, ps, 1, "spikes_3", cooldown_s=0.35)
+    pz["spikes"].active = not _rect_overlap(block, pz["plate"])
+    _block_plate_check(room)
+    pz["switch"].on = bool(pz["switch_on"])
+    block.grabbed = bool(pz["block_grabbed_by"])
 
-    _room3_check(room)
-    if sw:
-        sw["on"] = bool(pz.get("switch_on"))
-    block["grabbed"] = bool(pz.get("block_grabbed_by"))
-    _sync_door_entity(rt)
+
+def _block_plate_interact(room: Any, params: Mapping[str, Any], ps: Any) -> None:
+    pz = room.room_runtime["puzzle"]
+    if ps.role == "guardian" and _near(ps, pz["block"], params["grab_radius"]):
+        pz["block_grabbed_by"] = ps.player_id
+        return
+    if ps.role == "scholar" and _near(ps, pz["switch"], params["switch_radius"]):
+        pz["switch_on"] = True
+        room.add_message({"t": room.tick, "kind": "system", "text": "Switch activated."})
+        _block_plate_check(room)
 
 
-def _room3_check(room: Any) -> None:
+def _block_plate_check(room: Any) -> None:
     rt = room.room_runtime
     pz = rt["puzzle"]
-    if pz.get("switch_on") and not pz.get("spikes", {}).get("active", True):
+    if pz["switch_on"] and not pz["spikes"].active:
         rt["door_open"] = True
 
 
-def _room4(rt: dict[str, Any]) -> None:
-    sign = {"id": "sign", "type": "sign", "x": 160, "y": 110, "w": 60, "h": 80}
-    valves = [
-        {"id": "v1", "type": "valve", "x": 450, "y": 200, "w": 46, "h": 46},
-        {"id": "v2", "type": "valve", "x": 550, "y": 200, "w": 46, "h": 46},
-        {"id": "v3", "type": "valve", "x": 650, "y": 200, "w": 46, "h": 46},
-    ]
-    order = ["v2", "v1", "v3"]
-    rt["puzzle"] = {
-        "sign": sign,
-        "valves": valves,
-        "order": order,
-        "order_revealed": False,
-        "step": 0,
-        "water": 0.0,
-        "solved": False,
-    }
-    rt["entities"] = [
-        sign,
-        *valves,
-        {"type": "water", "x": 0, "y": 380, "w": 960, "h": 0},
-        {"type": "door", "x": 885, "y": 240, "w": 30, "h": 80},
-    ]
+# --- valves: guardian turns valves in the order the scholar reads; mistakes flood the room
+
 
+def _valves_build(pz: dict[str, Any], params: Mapping[str, Any], ents: dict[str, Entity]) -> None:
+    pz["sign"] = ents[params["sign"]]
+    pz["valves"] = [ents[k] for k in params["valves"]]
+    pz["order"] = list(params["order"])
+    pz["order_revealed"] = False
+    pz["step"] = 0
+    pz["water"] = 0.0
+    pz["pool"] = ents[params["pool"]]
+    pz["flooded"] = False
+    pz["solved"] = False
 
-def _room4_tick(room: Any, dt: float) -> None:
+
+def _valves_tick(room: Any, params: Mapping[str, Any], dt: float) -> None:
     rt = room.room_runtime
     pz = rt["puzzle"]
-    sign = pz.get("sign")
-    if sign:
-        sign["read"] = bool(pz.get("order_revealed"))
-
-    pz["water"] = max(0.0, pz["water"] - dt * 0.05)
-    water_h = int(160 * pz["water"])
-    for ent in rt["entities"]:
-        if ent.get("type") == "water":
-            ent["h"] = water_h
-            ent["y"] = 540 - water_h
-
-    if pz["water"] > 0.65 and water_h > 0:
-        water_zone = {"x": 0, "y": 540 - water_h, "w": 960, "h": water_h}
-        for ps in room.players.values():
-            if _player_in_rect(ps, water_zone):
-                _damage(room, ps, 1, "water_room4", cooldown_s=0.6)
+    pz["sign"].read = bool(pz["order_revealed"])
+
+    pz["water"] = max(0.0, pz["water"] - dt * params["drain_per_s"])
+    water_h = int(params["max_height"] * pz["water"])
+    pool = pz["pool"]
+    pool.h = water_h
+    pool.y = params["floor_y"] - water_h
+    pz["flooded"] = pz["water"] > params["flood_level"] and water_h > 0
 
-    if pz.get("solved"):
+    if pz["solved"]:
         rt["door_open"] = True
 
-    _sync_door_entity(rt)
 
+def _valves_interact(room: Any, params: Mapping[str, Any], ps: Any) -> None:
+    pz = room.room_runtime["puzzle"]
+    if ps.role == "scholar" and _near(ps, pz["sign"], params["read_radius"]):
+        pz["order_revealed"] = True
+        room.add_message({"t": room.tick, "kind": "system", "text": "Scholar read pipe markings."})
+        return
+    if ps.role != "guardian":
+        return
+    valve = _first_near(room, ps, params["valves"], params["valve_radius"])
+    if valve is not None:
+        _valves_turn(room, params, valve.key)
 
-def _room4_turn_valve(room: Any, valve_id: str) -> None:
-    rt = room.room_runtime
-    pz = rt["puzzle"]
-    if pz.get("solved"):
+
+def _valves_turn(room: Any, params: Mapping[str, Any], valve_id: str) -> None:
+    pz = room.room_runtime["puzzle"]
+    if pz["solved"]:
         return
-    step = int(pz.get("step", 0))
-    order = pz.get("order", [])
+    step = pz["step"]
+    order = pz["order"]
     if step < len(order) and valve_id == order[step]:
         pz["step"] = step + 1
-        room.messages.append({"t": room.tick, "kind": "system", "text": f"Valve OK ({step+1}/3)."})
+        room.add_message({"t": room.tick, "kind": "system", "text": f"Valve OK ({step+1}/{len(order)})."})
         if pz["step"] >= len(order):
             pz["solved"] = True
-            room.messages.append({"t": room.tick, "kind": "system", "text": "Valves solved!"})
+            room.add_message({"t": room.tick, "kind": "system", "text": "Valves solved!"})
     else:
-        pz["water"] = min(1.0, pz["water"] + 0.25)
+        pz["water"] = min(1.0, pz["water"] + params["rise_per_mistake"])
         pz["step"] = 0
-        room.messages.append({"t": room.tick, "kind": "system", "text": "Wrong valve! Water rises."})
-
-
-def _room5(rt: dict[str, Any]) -> None:
-    plate_l = {"id": "plate_l", "type": "plate", "x": 300, "y": 360, "w": 46, "h": 46}
-    plate_r = {"id": "plate_r", "type": "plate", "x": 600, "y": 360, "w": 46, "h": 46}
-    panel = {"id": "panel", "type": "panel", "x": 450, "y": 180, "w": 60, "h": 60}
-    spikes = {"id": "spikes_5", "type": "spikes", "x": 420, "y": 240, "w": 120, "h": 80}
-    rt["puzzle"] = {
-        "plate_l": plate_l,
-        "plate_r": plate_r,
-        "panel": panel,
-        "panel_active": False,
-        "spikes": spikes,
-        "plates_ok": False,
-    }
-    rt["entities"] = [plate_l, plate_r, panel, spikes, {"type": "door", "x": 885, "y": 240, "w": 30, "h": 80}]
+        room.add_message({"t": room.tick, "kind": "system", "text": "Wrong valve! Water rises."})
+
 
+# --- final_panel: plates held + panel active unlock code entry (see GameServer._handle_code_submit)
 
-def _room5_tick(room: Any, dt: float) -> None:
+
+def _final_panel_build(pz: dict[str, Any], params: Mapping[str, Any], ents: dict[str, Entity]) -> None:
+    pz["plates"] = [ents[k] for k in params["plates"]]
+    pz["panel"] = ents[params["panel"]]
+    pz["panel_active"] = False
+    pz["plates_ok"] = False
+
+
+def _final_panel_tick(room: Any, params: Mapping[str, Any], dt: float) -> None:
     rt = room.room_runtime
     pz = rt["puzzle"]
-    spikes = pz["spikes"]
-    panel = pz.get("panel")
+    pz["plates_ok"] = all(_occupied(room, plate) for plate in pz["plates"])
+    pz["panel"].active = bool(pz["panel_active"])
+    if pz["plates_ok"] and rt.get("final_unlocked"):
+        rt["door_open"] = True
 
-    phase = (room.tick % 30) / 30.0
-    spikes["active"] = phase < 0.4
-    if spikes["active"]:
-        for ps in room.players.values():
-            if _player_in_rect(ps, spikes):
-                _damage(room, ps, 1, "spikes_5", cooldown_s=0.35)
 
-    plates_ok = _any_player_in_rect(room, pz["plate_l"]) and _any_player_in_rect(room, pz["plate_r"])
-    pz["plates_ok"] = plates_ok
-    if panel:
-        panel["active"] = bool(pz.get("panel_active"))
+def _final_panel_interact(room: Any, params: Mapping[str, Any], ps: Any) -> None:
+    pz = room.room_runtime["puzzle"]
+    if _near(ps, pz["panel"], params["panel_radius"]):
+        pz["panel_active"] = True
 
-    if plates_ok and rt.get("final_unlocked"):
-        rt["door_open"] = True
 
-    _sync_door_entity(rt)
+KINDS: dict[str, RoomKind] = {
+    "plates_hold": RoomKind(_plates_hold_build, _plates_hold_tick, _noop_interact, occupancy=True),
+    "levers": RoomKind(_levers_build, _levers_tick, _levers_interact),
+    "block_plate": RoomKind(_block_plate_build, _block_plate_tick, _block_plate_interact),
+    "valves": RoomKind(_valves_build, _valves_tick, _valves_interact),
+    "final_panel": RoomKind(_final_panel_build, _final_panel_tick, _final_panel_interact, occupancy=True),
+}
+
+
+def _compile_dispatch(defs: tuple[RoomDef, ...]) -> tuple[RoomKind, ...]:
+    table = []
+    for room_def in defs:
+        kind = KINDS.get(room_def.kind)
+        if kind is None:
+            raise ValueError(f"room {room_def.index}: unknown kind {room_def.kind!r}")
+        table.append(kind)
+    return tuple(table)
+
+
+# Indexed by room_index so the per-tick path is a tuple lookup, not a chain of ifs.
+_DISPATCH = _compile_dispatch(ROOM_DEFS)
+_TEMPLATES = tuple(_make_template(i) for i in range(ROOM_COUNT))
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from .metrics import ROOM_FAILURES, TICK_LAG_SECONDS, TICK_SECONDS
+
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class TickStats:
+    ticks: int = 0
+    late_ticks: int = 0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+    last_step_time: float = 0.0
+    last_batch: int = 0
+
+
+class TickScheduler:
+    """Single timer that steps every active room once per tick.
+
+    Rooms are registered with `add` when they start and removed with `discard`
+    when they stop, so lobbies and empty rooms cost nothing. Each tick runs
+    `step(room)` for every active room, then awaits `publish(rooms)` once for
+    the whole batch. A room whose step (or publish, through `fail`) raises is
+    logged and dropped; the timer and every other room keep going.
+    """
+
+    def __init__(
+        self,
+        tick_hz: float,
+        step: Callable[[Any], None],
+        publish: Callable[[list[Any]], Awaitable[None]],
+    ) -> None:
+        self.dt = 1.0 / tick_hz
+        self._step = step
+        self._publish = publish
+        self._rooms: dict[str, Any] = {}
+        self._task: asyncio.Task | None = None
+        self.stats = TickStats()
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def __contains__(self, room: Any) -> bool:
+        return room.code in self._rooms
+
+    def add(self, room: Any) -> None:
+        self._rooms[room.code] = room
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def discard(self, room: Any) -> None:
+        self._rooms.pop(room.code, None)
+
+    def fail(self, room: Any, exc: BaseException) -> None:
+        """Take a room that raised out of the schedule."""
+        log.error("room %s failed at tick %s; no longer stepped", room.code, room.tick, exc_info=exc)
+        ROOM_FAILURES.inc()
+        self.discard(room)
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        dt = self.dt
+        stats = self.stats
+        next_time = time.perf_counter() + dt
+        while self._rooms:
+            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+            start = time.perf_counter()
+
+            # How late this tick fired relative to its slot on the fixed grid.
+            lag = max(0.0, start - next_time)
+            stats.ticks += 1
+            stats.last_lag = lag
+            TICK_LAG_SECONDS.observe(lag)
+            if lag > stats.max_lag:
+                stats.max_lag = lag
+            if lag > dt:
+                stats.late_ticks += 1
+                # Drop the missed slots instead of bursting to catch up.
+                next_time = start
+            next_time += dt
+
+            batch = []
+            for room in [room for room in self._rooms.values() if room.started and room.conns]:
+                try:
+                    self._step(room)
+                except Exception as exc:
+                    self.fail(room, exc)
+                    continue
+                batch.append(room)
+            stats.last_batch = len(batch)
+            if batch:
+                await self._publish(batch)
+            stats.last_step_time = time.perf_counter() - start
+            TICK_SECONDS.observe(stats.last_step_time)
+        self._task = None
@@ -0,0 +1,212 @@
+"""Client -> server message validation compiled from shared/schema.json.
+
+Every `ClientToServer` variant becomes one check function, keyed by its
+`type` const, generated as Python source and compiled once at import.
+Only the keywords the schema uses are supported: type, const, enum,
+minimum, maximum, required, properties, additionalProperties, items,
+prefixItems, minItems and maxItems (anything else, like description, is
+ignored). Numbers must also be finite, which
+JSON Schema leaves open but stdlib json does not enforce (it reads NaN and
+Infinity, and integers of any length, which `float()` then overflows on).
+
+`parse_message` is the whole text-frame path: a length check before any
+JSON work, one `loads`, then the check for the frame's type. Handlers can
+rely on the field types the schema gives them.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any, Callable
+
+from .codec import loads
+from .room_defs import SHARED_DIR
+
+
+SCHEMA_PATH = SHARED_DIR / "schema.json"
+# Longer text frames are refused unparsed. Real ones are a few hundred characters; an input with
+# its redundant copies is the largest.
+MAX_MESSAGE_CHARS = 2048
+
+# Returns None for a valid value, otherwise why it is not.
+Check = Callable[[Any], "str | None"]
+
+
+class BadMessage(ValueError):
+    """A client frame that was refused; `code` goes into the error reply."""
+
+    def __init__(self, code: str, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+def _resolve(schema: dict[str, Any], defs: dict[str, Any]) -> dict[str, Any]:
+    while "$ref" in schema:
+        schema = defs[schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+
+class _Codegen:
+    """Writes one flat Python function per message type; checks run inline, with no call per field."""
+
+    def __init__(self, defs: dict[str, Any]) -> None:
+        self.defs = defs
+        self.lines: list[str] = []
+        self.consts: dict[str, Any] = {}
+        self._names = 0
+
+    def _name(self, prefix: str) -> str:
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+    def _const(self, value: Any) -> str:
+        name = self._name("_c")
+        self.consts[name] = value
+        return name
+
+    def _fail(self, pad: str, cond: str, problem: str) -> None:
+        self.lines.append(f"{pad}if {cond}:")
+        self.lines.append(f"{pad}    return {problem!r}")
+
+    def value(self, schema: dict[str, Any], var: str, where: str, pad: str) -> None:
+        schema = _resolve(schema, self.defs)
+        kind = schema.get("type")
+        if kind == "object" or "properties" in schema:
+            self._object(schema, var, where, pad)
+        elif kind == "array":
+            self._array(schema, var, where, pad)
+        else:
+            self._scalar(schema, var, where, pad)
+
+    def _scalar(self, schema: dict[str, Any], var: str, where: str, pad: str) -> None:
+        kind = schema.get("type")
+        # bool is an int subclass, hence the exact type tests.
+        if kind == "integer":
+            self._fail(pad, f"type({var}) is not int", f"{where}: expected an integer")
+        elif kind == "number":
+            self._fail(
+                pad,
+                f"not ((type({var}) is int and -FLOAT_MAX <= {var} <= FLOAT_MAX)"
+                f" or (type({var}) is float and isfinite({var})))",
+                f"{where}: expected a finite number",
+            )
+        elif kind == "string":
+            self._fail(pad, f"type({var}) is not str", f"{where}: expected a string")
+        elif kind == "boolean":
+            self._fail(pad, f"type({var}) is not bool", f"{where}: expected a boolean")
+        if "const" in schema:
+            self._fail(pad, f"{var} != {self._const(schema['const'])}", f"{where}: expected {schema['const']!r}")
+        if "enum" in schema:
+            allowed = tuple(schema["enum"])
+            self._fail(pad, f"{var} not in {self._const(allowed)}", f"{where}: expected one of {list(allowed)}")
+        if "minimum" in schema:
+            self._fail(pad, f"{var} < {schema['minimum']!r}", f"{where}: below {schema['minimum']}")
+        if "maximum" in schema:
+            self._fail(pad, f"{var} > {schema['maximum']!r}", f"{where}: above {schema['maximum']}")
+
+    def _array(self, schema: dict[str, Any], var: str, where: str, pad: str) -> None:
+        self._fail(pad, f"type({var}) is not list", f"{where}: expected an array")
+        prefix = [_resolve(s, self.defs) for s in schema.get("prefixItems", ())]
+        low, high = schema.get("minItems", 0), schema.get("maxItems")
+        if high == low:
+            self._fail(pad, f"len({var}) != {low}", f"{where}: expected {low} items")
+        elif high is not None:
+            self._fail(pad, f"not {low} <= len({var}) <= {high}", f"{where}: expected {low} to {high} items")
+        elif low:
+            self._fail(pad, f"len({var}) < {low}", f"{where}: expected at least {low} items")
+        for i, item in enumerate(prefix):
+            item_var = self._name("_v")
+            inner = pad
+            if i >= low:
+                self.lines.append(f"{pad}if len({var}) > {i}:")
+                inner = pad + "    "
+            self.lines.append(f"{inner}{item_var} = {var}[{i}]")
+            self.value(item, item_var, f"{where}[{i}]", inner)
+        if "items" in schema:
+            item_var = self._name("_v")
+            self.lines.append(f"{pad}for {item_var} in {var}[{len(prefix)}:]:")
+            body = len(self.lines)
+            self.value(schema["items"], item_var, f"{where}[]", pad + "    ")
+            if len(self.lines) == body:
+                self.lines.append(f"{pad}    pass")
+
+    def _object(self, schema: dict[str, Any], var: str, where: str, pad: str) -> None:
+        self._fail(pad, f"type({var}) is not dict", f"{where}: expected an object")
+        properties = schema.get("properties", {})
+        required = schema.get("required", ())
+        for key in required:
+            self._fail(pad, f"{key!r} not in {var}", f"{where}.{key}: missing")
+        if schema.get("additionalProperties") is False:
+            known = self._const(frozenset(properties))
+            self._fail(pad, f"not {known}.issuperset({var})", f"{where}: unexpected field")
+        for key, field_schema in properties.items():
+            field_var = self._name("_v")
+            inner = pad
+            if key in required:
+                self.lines.append(f"{pad}{field_var} = {var}[{key!r}]")
+            else:
+                self.lines.append(f"{pad}if {key!r} in {var}:")
+                inner = pad + "    "
+                self.lines.append(f"{inner}{field_var} = {var}[{key!r}]")
+            self.value(field_schema, field_var, f"{where}.{key}", inner)
+
+    def function(self, schema: dict[str, Any], where: str) -> Check:
+        self.lines = ["def check(msg):"]
+        self.value(schema, "msg", where, "    ")
+        self.lines.append("    return None")
+        namespace: dict[str, Any] = {"isfinite": math.isfinite, "FLOAT_MAX": sys.float_info.max, **self.consts}
+        exec(compile("\n".join(self.lines), f"<schema {where}>", "exec"), namespace)
+        return namespace["check"]
+
+
+def compile_client_messages(path: Path = SCHEMA_PATH) -> dict[str, Check]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    defs = data["$defs"]
+    checks: dict[str, Check] = {}
+    for variant in defs["ClientToServer"]["oneOf"]:
+        schema = _resolve(variant, defs)
+        msg_type = schema["properties"]["type"]["const"]
+        checks[msg_type] = _Codegen(defs).function(schema, msg_type)
+    return checks
+
+
+CLIENT_MESSAGES = compile_client_messages()
+# How the browser client and the bots start every frame (JSON.stringify / json.dumps key order).
+_TYPE_PREFIXES = ('{"type":"', '{"type": "')
+
+
+def sniff_type(text: str) -> str | None:
+    """A known message type read off the start of an unparsed frame; None if it does not start that way.
+
+    Only a hint (a frame may repeat the key); the parsed `type` is what counts.
+    """
+    for prefix in _TYPE_PREFIXES:
+        if text.startswith(prefix):
+            start = len(prefix)
+            end = text.find('"', start, start + 16)
+            msg_type = text[start:end] if end > 0 else None
+            return msg_type if msg_type in CLIENT_MESSAGES else None
+    return None
+
+
+def parse_message(text: str) -> dict[str, Any]:
+    """Parse and validate one client text frame; raises BadMessage."""
+    if len(text) > MAX_MESSAGE_CHARS:
+        raise BadMessage("too_large", f"Frames are limited to {MAX_MESSAGE_CHARS} characters.")
+    try:
+        msg = loads(text)
+    except (ValueError, RecursionError):
+        raise BadMessage("bad_json", "Frame is not valid JSON.") from None
+    if type(msg) is not dict:
+        raise BadMessage("bad_message", "Frame is not a JSON object.")
+    msg_type = msg.get("type")
+    check = CLIENT_MESSAGES.get(msg_type) if type(msg_type) is str else None
+    if check is None:
+        raise BadMessage("bad_type", f"Unknown type: {str(msg_type)[:32]}")
+    problem = check(msg)
+    if problem:
+        raise BadMessage("bad_message", problem[:200])
+    return msg
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+from dataclasses import dataclass
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring mapping room codes to worker indexes 0..workers-1.
+
+    Every process builds the same ring from the worker count alone, so the
+    router and the workers agree on ownership without talking to each other.
+    """
+
+    def __init__(self, workers: int, replicas: int = 64) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.workers = workers
+        points = sorted((_hash(f"worker-{w}#{r}"), w) for w in range(workers) for r in range(replicas))
+        self._keys = [k for k, _ in points]
+        self._owners = [w for _, w in points]
+
+    def owner(self, room_code: str) -> int:
+        i = bisect.bisect(self._keys, _hash(room_code))
+        return self._owners[i % len(self._owners)]
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    ring: HashRing
+
+    def owns(self, room_code: str) -> bool:
+        return self.ring.owner(room_code) == self.index
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+
+# How many past snapshots a room keeps as delta baselines (1.6s at 20Hz).
+SNAPSHOT_HISTORY = 32
+# Encoding cache key for keyframes (real baselines are tick numbers >= 0).
+KEYFRAME = -1
+
+
+@dataclass
+class Snapshot:
+    tick: int
+    epoch: int
+    room_index: int
+    players: dict[int, dict[str, Any]]
+    entities: list[dict[str, Any]]
+    ui: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+
+class SnapshotHistory:
+    """Bounded tick -> Snapshot map used to resolve client acks into baselines."""
+
+    def __init__(self, size: int = SNAPSHOT_HISTORY) -> None:
+        self._size = size
+        self._snaps: OrderedDict[int, Snapshot] = OrderedDict()
+
+    def add(self, snap: Snapshot) -> None:
+        self._snaps[snap.tick] = snap
+        while len(self._snaps) > self._size:
+            self._snaps.popitem(last=False)
+
+    def get(self, tick: int) -> Snapshot | None:
+        return self._snaps.get(tick)
+
+    def clear(self) -> None:
+        self._snaps.clear()
+
+
+def diff_fields(base: dict[str, Any], cur: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in cur.items() if base.get(k) != v}
+
+
+def keyframe_payload(snap: Snapshot) -> dict[str, Any]:
+    return {
+        "type": "state",
+        "keyframe": True,
+        "tick": snap.tick,
+        "room_index": snap.room_index,
+        "players": list(snap.players.values()),
+        "entities": snap.entities,
+    }
+
+
+def delta_payload(base: Snapshot, snap: Snapshot) -> dict[str, Any]:
+    """Role-independent changes from `base` to `snap`; callers must check both share an epoch.
+
+    The per-role `ui` object is left out so the result can be encoded once and
+    shared by every connection acking the same baseline.
+    """
+    msg: dict[str, Any] = {
+        "type": "state_delta",
+        "tick": snap.tick,
+        "base_tick": base.tick,
+        "room_index": snap.room_index,
+    }
+
+    players = []
+    for pid, cur in snap.players.items():
+        changed = diff_fields(base.players.get(pid, {}), cur)
+        if changed:
+            changed["player_id"] = pid
+            players.append(changed)
+    if players:
+        msg["players"] = players
+
+    entities = []
+    base_entities = base.entities
+    for idx, cur in enumerate(snap.entities):
+        prev = base_entities[idx]
+        if cur is prev:
+            # Same cached wire dict -> the entity has not changed since the baseline.
+            continue
+        changed = diff_fields(prev, cur)
+        if changed:
+            entities.append([idx, changed])
+    if entities:
+        msg["entities"] = entities
+    return msg
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+
+class UniformGrid:
+    """Static rects bucketed into square cells, built once per room layout.
+
+    Queries return candidate indexes from the cells they touch; callers still
+    do the exact test, but only against what is nearby instead of every entity.
+    Rects that move at runtime must not be added (see RoomDef.mobile).
+
+    Per-tick loops may read `cells` directly with `(x // cell, y // cell)`
+    keys, as `at` does, to skip the method call per player.
+    """
+
+    def __init__(self, rects: Iterable[tuple[int, tuple[float, float, float, float]]], cell: float) -> None:
+        self.cell = cell
+        cells: dict[tuple[int, int], list[int]] = {}
+        for index, (x, y, w, h) in rects:
+            for cx in range(int(x // cell), int((x + w) // cell) + 1):
+                for cy in range(int(y // cell), int((y + h) // cell) + 1):
+                    cells.setdefault((cx, cy), []).append(index)
+        self.cells = {key: tuple(indexes) for key, indexes in cells.items()}
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def at(self, x: float, y: float) -> tuple[int, ...]:
+        """Indexes whose rect may contain (x, y), ascending."""
+        # Float floor-division keys hash and compare equal to the int keys; skipping int() is measurably faster.
+        cell = self.cell
+        return self.cells.get((x // cell, y // cell), ())
+
+    def around(self, x: float, y: float, r: float) -> frozenset[int] | tuple[int, ...]:
+        """Indexes whose rect may lie within r of (x, y)."""
+        cell = self.cell
+        x0, x1 = int((x - r) // cell), int((x + r) // cell)
+        y0, y1 = int((y - r) // cell), int((y + r) // cell)
+        if x0 == x1 and y0 == y1:
+            return self.cells.get((x0, y0), ())
+        found: set[int] = set()
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                hit = cells.get((cx, cy))
+                if hit:
+                    found.update(hit)
+        return frozenset(found)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+from websockets.asyncio.client import connect
+
+from server.game_server import RESUMED_ELSEWHERE_CLOSE
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def cluster_url():
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "server.cluster", "--workers", "1", "--port", str(port)],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise
+                time.sleep(0.2)
+        yield f"ws://127.0.0.1:{port}/ws"
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+async def _join(url: str, code: str, token: str = ""):
+    ws = await connect(url)
+    await ws.send(json.dumps({"type": "hello", "version": 1}))
+    await ws.send(json.dumps({"type": "join", "room_code": code, "resume_token": token}))
+    while True:
+        msg = json.loads(await ws.recv())
+        if msg["type"] == "joined":
+            return ws, msg
+
+
+async def _close_code(ws) -> int | None:
+    try:
+        async for _ in ws:
+            pass
+    except Exception:
+        pass
+    return ws.close_code
+
+
+def test_takeover_closes_old_socket_with_4009(cluster_url):
+    async def run():
+        old, joined = await _join(cluster_url, "TAKEO")
+        new, rejoined = await _join(cluster_url, "TAKEO", joined["resume_token"])
+        try:
+            assert rejoined["resumed"]
+            assert await asyncio.wait_for(_close_code(old), 5) == RESUMED_ELSEWHERE_CLOSE
+        finally:
+            await new.close()
+
+    asyncio.run(run())
@@ -0,0 +1,53 @@
+import asyncio
+
+from server.game_server import GameServer, PlayerState
+from server.hibernate import RoomStore
+
+
+class FakeSocket:
+    def __init__(self) -> None:
+        self.sent: list = []
+
+    async def send_json(self, msg) -> None:
+        self.sent.append(msg)
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(text)
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def _hibernated(server: GameServer, store: RoomStore, code: str) -> list[str]:
+    """Store a two-player lobby under `code`; returns its players' resume tokens."""
+    room = server._create_room(code)
+    for pid, role in ((1, "guardian"), (2, "scholar")):
+        room.players[pid] = PlayerState(player_id=pid, role=role, x=100.0, y=100.0, resume_token=f"token-{pid}")
+    store.save(code, server._snapshot_room(room))
+    return [ps.resume_token for ps in room.players.values()]
+
+
+def test_join_without_seat_leaves_hibernated_room_stored(tmp_path):
+    async def run():
+        store = RoomStore(tmp_path, ttl_s=3600)
+        server = GameServer(store=store)
+        tokens = _hibernated(server, store, "SLEEP")
+
+        ws = FakeSocket()
+        room, player_id = await server._handle_join(ws, {"type": "join", "room_code": "SLEEP"})
+        assert (room, player_id) == (None, -1)
+        assert ws.sent[-1]["code"] == "room_full"
+        assert "SLEEP" in store
+        assert server.room_count == 0
+
+        room, player_id = await server._handle_join(
+            FakeSocket(), {"type": "join", "room_code": "SLEEP", "resume_token": tokens[1]}
+        )
+        assert player_id == 2
+        assert set(room.away) == {1}
+        assert "SLEEP" not in store
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+import pytest
+
+from server.game_server import MOVEMENT, GameServer, PlayerConn, PlayerState
+from server.util import clamp
+
+
+DIRECTIONS = [(1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0), (1.0, 0.0)]
+
+
+def _predict(x: float, y: float, speed: float, inputs: list[tuple[float, float]]) -> tuple[float, float]:
+    """The client's stepMovement over `inputs` (door closed)."""
+    b = MOVEMENT.bounds
+    for mx, my in inputs:
+        x = clamp(x + mx * speed * MOVEMENT.input_dt, b.x, b.x + b.w)
+        y = clamp(y + my * speed * MOVEMENT.input_dt, b.y, b.y + b.h)
+        x = min(x, MOVEMENT.door_closed_max_x)
+    return x, y
+
+
+@pytest.mark.parametrize("sim_hz", [10, 30, 60])
+def test_each_input_moves_for_input_dt(sim_hz):
+    server = GameServer(sim_hz=sim_hz)
+    room = server._create_room("PACE")
+    ps = room.players[1] = PlayerState(player_id=1, role="guardian", x=300.0, y=300.0)
+    conn = room.conns[1] = PlayerConn(ws=None, player_id=1, role="guardian")
+    speed = MOVEMENT.speed["guardian"]
+    sent: list[tuple[float, float]] = []
+
+    for tick in range(1, 3 * sim_hz + 1):
+        # The client's input loop, on its own clock: one input per input_dt.
+        while len(sent) * MOVEMENT.input_dt <= tick / sim_hz:
+            mx, my = DIRECTIONS[len(sent) // 3 % len(DIRECTIONS)]
+            conn.inputs.append((len(sent), mx, my, False))
+            sent.append((mx, my))
+        server._step_room(room)
+        # Where the owner lands replaying from scratch up to the acked seq; reconciliation needs them equal.
+        expected = _predict(300.0, 300.0, speed, sent[: conn.processed_seq + 1])
+        assert (ps.x, ps.y) == pytest.approx(expected)
+
+    assert conn.processed_seq >= 3 * round(1 / MOVEMENT.input_dt) - 2
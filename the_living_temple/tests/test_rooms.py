@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+from server.game_server import GameServer, PlayerConn, PlayerState
+from server.rooms import reset_room_runtime_state
+
+
+def _send(server: GameServer, room, conn: PlayerConn) -> dict:
+    """One state broadcast to `conn`, decoded; the frame is taken as if the socket had sent it."""
+    room.tick += 1
+    conn.next_send_tick = 0
+    asyncio.run(server._broadcast_state(room))
+    frame, conn.outbox._state = conn.outbox._state, None
+    return json.loads(frame)
+
+
+def test_reset_sends_keyframe_after_open_door():
+    server = GameServer()
+    room = server._create_room("RESET")
+    room.players[1] = PlayerState(player_id=1, role="guardian", x=100.0, y=100.0)
+    conn = room.conns[1] = PlayerConn(ws=None, player_id=1, role="guardian", delta=True)
+    door = room.room_runtime["door"]
+
+    assert _send(server, room, conn)["type"] == "state"
+    conn.ack_tick = room.tick
+    door.open = True
+    msg = _send(server, room, conn)
+    assert msg["type"] == "state_delta"
+    assert msg["entities"] == [[room.room_runtime["entities"].index(door), {"open": True}]]
+
+    conn.ack_tick = room.tick
+    reset_room_runtime_state(room)
+    msg = _send(server, room, conn)
+    assert msg["type"] == "state"
+    assert msg["keyframe"]
+    assert not any(e.get("open") for e in msg["entities"] if e["type"] == "door")